@@ -10,16 +10,18 @@ from fastapi import (
     UploadFile,
     BackgroundTasks,
 )
-from pydantic import UUID4
+from fastapi.concurrency import run_in_threadpool
 
 from api import deps
 from core import settings
 from schemas import PDF
-from utils import decode_jwt_token
 from utils.animals_report import process_animal_data
 from utils.farm_calendar_report import process_farm_calendar_data
 from utils.irrig_fert_pest_report import process_irrigation_fertilization_data
-from fastapi.responses import FileResponse
+from utils.report_executor import run_report_task
+from utils.pdf_cache import pop_pdf
+from utils.upload_handler import spool_upload
+from fastapi.responses import FileResponse, Response
 
 router = APIRouter()
 
@@ -27,29 +29,38 @@ router = APIRouter()
 @router.get("/{report_id}/", response_class=FileResponse)
 def retrieve_generated_pdf(
     report_id: str,
-    token=Depends(deps.get_current_user),
+    user_id: str = Depends(deps.get_user_id),
 ):
     """
 
     Retrieve generated PDF file
 
     """
-    user_id = (
-        decode_jwt_token(token)["user_id"]
-        if settings.REPORTING_USING_GATEKEEPER
-        else token.id
-    )
+
+    content = pop_pdf(f"{user_id}/{report_id}")
+    if content is not None:
+        return Response(
+            content=content,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="{report_id}"'},
+        )
 
     file_path = f"{settings.PDF_DIRECTORY}{user_id}/{report_id}.pdf"
 
-    if not os.path.exists(file_path):
+    # One stat call checks existence and is reused by FileResponse
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=202,
             detail=f"PDF uuid {report_id} is being generated. Please be patient and try again in couple of seconds.",
         )
 
     return FileResponse(
-        path=file_path, media_type="application/pdf", filename=f"{report_id}"
+        path=file_path,
+        media_type="application/pdf",
+        filename=f"{report_id}",
+        stat_result=stat_result,
     )
 
 
@@ -57,6 +68,7 @@ def retrieve_generated_pdf(
 async def generate_irrigation_report(
     background_tasks: BackgroundTasks,
     token=Depends(deps.get_current_user),
+    user_id: str = Depends(deps.get_user_id),
     irrigation_id: str = None,
     data: UploadFile = None,
     from_date: datetime.date = None,
@@ -68,11 +80,6 @@ async def generate_irrigation_report(
 
     """
     uuid_v4 = str(uuid.uuid4())
-    user_id = (
-        decode_jwt_token(token)["user_id"]
-        if settings.REPORTING_USING_GATEKEEPER
-        else token.id
-    )
     uuid_of_pdf = f"{user_id}/{uuid_v4}"
 
     if not data and not settings.REPORTING_USING_GATEKEEPER:
@@ -80,11 +87,13 @@ async def generate_irrigation_report(
             status_code=400,
             detail=f"Data file must be provided if gatekeeper is not used.",
         )
-    if data:
-        data = data.file.read()
+    data_path = None
+    if data is not None:
+        data_path = await run_in_threadpool(spool_upload, data)
     background_tasks.add_task(
+        run_report_task,
         process_irrigation_fertilization_data,
-        data=data,
+        data_path=data_path,
         token=token,
         pdf_file_name=uuid_of_pdf,
         from_date=from_date,
@@ -101,6 +110,7 @@ async def generate_generic_observation_report(
     background_tasks: BackgroundTasks,
     calendar_activity_type: str = None,
     token=Depends(deps.get_current_user),
+    user_id: str = Depends(deps.get_user_id),
     data: UploadFile = None,
     operation_id: str = None,
     from_date: datetime.date = None,
@@ -114,19 +124,16 @@ async def generate_generic_observation_report(
     """
 
     uuid_v4 = str(uuid.uuid4())
-    user_id = (
-        decode_jwt_token(token)["user_id"]
-        if settings.REPORTING_USING_GATEKEEPER
-        else token.id
-    )
     uuid_of_pdf = f"{user_id}/{uuid_v4}"
-    if data:
-        data = data.file.read()
+    data_path = None
+    if data is not None:
+        data_path = await run_in_threadpool(spool_upload, data)
     background_tasks.add_task(
+        run_report_task,
         process_farm_calendar_data,
         calendar_activity_type=calendar_activity_type,
         token=token,
-        data=data,
+        data_path=data_path,
         pdf_file_name=uuid_of_pdf,
         operation_id=operation_id,
         from_date=from_date,
@@ -141,10 +148,11 @@ async def generate_generic_observation_report(
 async def generate_animal_report(
     background_tasks: BackgroundTasks,
     token=Depends(deps.get_current_user),
+    user_id: str = Depends(deps.get_user_id),
     farm_animal_id: str = None,
     animal_group: Optional[str] = None,
     name: Optional[str] = None,
-    parcel: Optional[UUID4] = None,
+    parcel: Optional[str] = None,
     status: Optional[int] = None,
     data: UploadFile = None,
     from_date: datetime.date = None,
@@ -155,11 +163,6 @@ async def generate_animal_report(
     Generates Animal Report PDF file
     """
     uuid_v4 = str(uuid.uuid4())
-    user_id = (
-        decode_jwt_token(token)["user_id"]
-        if settings.REPORTING_USING_GATEKEEPER
-        else token.id
-    )
     uuid_of_pdf = f"{user_id}/{uuid_v4}"
     params = None
     if not data:
@@ -175,16 +178,18 @@ async def generate_animal_report(
         if name:
             params["name"] = name
         if parcel:
-            params["parcel"] = str(parcel)
+            params["parcel"] = parcel
         if status is not None:
             params["status"] = status
         if parcel_id:
             params['parcel'] = parcel_id
-    if data:
-        data = data.file.read()
+    data_path = None
+    if data is not None:
+        data_path = await run_in_threadpool(spool_upload, data)
     background_tasks.add_task(
+        run_report_task,
         process_animal_data,
-        data=data,
+        data_path=data_path,
         token=token,
         params=params,
         pdf_file_name=uuid_of_pdf,
@@ -201,6 +206,7 @@ async def generate_animal_report(
 async def generate_fertilization_report(
     background_tasks: BackgroundTasks,
     token=Depends(deps.get_current_user),
+    user_id: str = Depends(deps.get_user_id),
     fertilization_id: str = None,
     data: UploadFile = None,
     from_date: datetime.date = None,
@@ -212,11 +218,6 @@ async def generate_fertilization_report(
 
     """
     uuid_v4 = str(uuid.uuid4())
-    user_id = (
-        decode_jwt_token(token)["user_id"]
-        if settings.REPORTING_USING_GATEKEEPER
-        else token.id
-    )
     uuid_of_pdf = f"{user_id}/{uuid_v4}"
 
     if not data and not settings.REPORTING_USING_GATEKEEPER:
@@ -224,11 +225,13 @@ async def generate_fertilization_report(
             status_code=400,
             detail=f"Data file must be provided if gatekeeper is not used.",
         )
-    if data:
-        data = data.file.read()
+    data_path = None
+    if data is not None:
+        data_path = await run_in_threadpool(spool_upload, data)
     background_tasks.add_task(
+        run_report_task,
         process_irrigation_fertilization_data,
-        data=data,
+        data_path=data_path,
         token=token,
         pdf_file_name=uuid_of_pdf,
         from_date=from_date,
@@ -246,6 +249,7 @@ async def generate_fertilization_report(
 async def generate_pesticides_report(
     background_tasks: BackgroundTasks,
     token=Depends(deps.get_current_user),
+    user_id: str = Depends(deps.get_user_id),
     pesticide_id: str = None,
     data: UploadFile = None,
     from_date: datetime.date = None,
@@ -257,11 +261,6 @@ async def generate_pesticides_report(
 
     """
     uuid_v4 = str(uuid.uuid4())
-    user_id = (
-        decode_jwt_token(token)["user_id"]
-        if settings.REPORTING_USING_GATEKEEPER
-        else token.id
-    )
     uuid_of_pdf = f"{user_id}/{uuid_v4}"
 
     if not data and not settings.REPORTING_USING_GATEKEEPER:
@@ -270,12 +269,14 @@ async def generate_pesticides_report(
             detail=f"Data file must be provided if gatekeeper is not used.",
         )
 
-    if data:
-        data = data.file.read()
+    data_path = None
+    if data is not None:
+        data_path = await run_in_threadpool(spool_upload, data)
 
     background_tasks.add_task(
+        run_report_task,
         process_irrigation_fertilization_data,
-        data=data,
+        data_path=data_path,
         token=token,
         pdf_file_name=uuid_of_pdf,
         from_date=from_date,
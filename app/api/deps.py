@@ -13,6 +13,7 @@ from crud import user
 from core import security
 from core.config import settings
 from db.session import SessionLocal
+from utils import decode_jwt_token
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="/api/v1/login/access-token/")
 
@@ -53,3 +54,23 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+
+
+# Gatekeeper mode is fixed for the lifetime of the process
+_USE_GK = settings.REPORTING_USING_GATEKEEPER
+
+if _USE_GK:
+
+    def get_user_id(token: str = Depends(get_current_user)) -> str:
+        """
+        ID of the user the report belongs to, resolved once per request
+        """
+        return decode_jwt_token(token)["user_id"]
+
+else:
+
+    def get_user_id(token: User = Depends(get_current_user)) -> str:
+        """
+        ID of the user the report belongs to, resolved once per request
+        """
+        return str(token.id)
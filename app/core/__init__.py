@@ -1 +1 @@
-from .config import settings
+from .config import settings, get_settings, ANIMAL_LIST_URL, FARMCALENDAR_URLS
@@ -1,7 +1,9 @@
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings
 from password_validator import PasswordValidator
-from typing import Optional, Any
+from typing import Optional, Any, Mapping
+from types import MappingProxyType
+from functools import cached_property, lru_cache
 
 from os import path, environ
 
@@ -23,7 +25,7 @@ class Settings(BaseSettings):
     REPORTING_USING_GATEKEEPER: bool = True
     REPORTING_GATEKEEPER_BASE_URL: str
     REPORTING_FARMCALENDAR_BASE_URL: str = "api/proxy/farmcalendar/api/v1"
-    REPORTING_FARMCALENDAR_URLS: dict = {
+    REPORTING_FARMCALENDAR_URLS: Mapping[str, str] = {
         "irrigations": "/IrrigationOperations/",
         "fertilization": "/FertilizationOperations/",
         "pesticides": "/CropProtectionOperations/",
@@ -39,10 +41,24 @@ class Settings(BaseSettings):
         "machines": "/AgriculturalMachines/",
         "farm": "/Farm/"
     }
+    # Field the farm calendar orders operation lists by (sent as "ordering"), e.g. "start_datetime".
+    # If set, operations are not sorted again by the reporting service.
+    REPORTING_FARMCALENDAR_ORDERING: Optional[str] = None
 
     PDF_DIRECTORY: str = "user_reports/"
+    PDF_CACHE_DIRECTORY: str = "user_reports_cache/"
+    WMS_CACHE_DIRECTORY: str = "user_reports_cache/wms/"
+    GEOCODE_CACHE_DIRECTORY: str = "user_reports_cache/geocode/"
+    # Seconds a report rendered from the same filters is reused, 0 disables it
+    REPORTING_PDF_CACHE_TTL: int = 300
+    REPORTING_PDF_WORKERS: Optional[int] = None
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
 
+    @field_validator("REPORTING_FARMCALENDAR_URLS")
+    def freeze_farmcalendar_urls(cls, v: Mapping[str, str]) -> Mapping[str, str]:
+        # Shared by every report, must not be changed at runtime
+        return MappingProxyType(dict(v))
+
     @field_validator("SQLALCHEMY_DATABASE_URI", mode="before")
     def assemble_db_connection(cls, v: Optional[str], values) -> Any:
         if isinstance(v, str):
@@ -58,12 +74,32 @@ class Settings(BaseSettings):
 
         return url
 
-    PASSWORD_SCHEMA_OBJ: PasswordValidator = PasswordValidator()
-    PASSWORD_SCHEMA_OBJ.min(8).max(
-        100
-    ).has().uppercase().has().lowercase().has().digits().has().no().spaces()
     JWT_ACCESS_TOKEN_EXPIRATION_TIME: int
     JWT_SIGNING_KEY: str
 
+    @cached_property
+    def PASSWORD_SCHEMA_OBJ(self) -> PasswordValidator:
+        # Built on first password validation only
+        schema = PasswordValidator()
+        schema.min(8).max(
+            100
+        ).has().uppercase().has().lowercase().has().digits().has().no().spaces()
+        return schema
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
+
+
+settings = get_settings()
+
+# Full farm calendar endpoint URLs per REPORTING_FARMCALENDAR_URLS key, joined once at import
+FARMCALENDAR_URLS: Mapping[str, str] = MappingProxyType(
+    {
+        name: f"{settings.REPORTING_FARMCALENDAR_BASE_URL}{path}"
+        for name, path in settings.REPORTING_FARMCALENDAR_URLS.items()
+    }
+)
 
-settings = Settings()
+ANIMAL_LIST_URL = FARMCALENDAR_URLS["animals"]
@@ -5,13 +5,18 @@ from starlette.middleware.cors import CORSMiddleware
 from core.config import settings
 from api.api_v1.api import api_router
 from init_gatekeeper import register_apis_to_gatekeeper
+from utils.json_handler import close_session
+from utils.report_executor import start_report_executor, shutdown_report_executor
 
 
 @asynccontextmanager
 async def lifespan(fa: FastAPI):
     if settings.REPORTING_USING_GATEKEEPER:
         register_apis_to_gatekeeper()
+    start_report_executor()
     yield
+    shutdown_report_executor()
+    close_session()
 
 
 app = FastAPI(
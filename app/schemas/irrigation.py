@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class QuantityValue(BaseModel):
@@ -11,6 +11,9 @@ class QuantityValue(BaseModel):
     numericValue: float
 
 class GenericModel(BaseModel):
+    # Operations are read-only once parsed, subclasses inherit this config
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
+
     type: str = Field(alias="@type")
     id: str = Field(alias="@id")
     activityType: Optional[dict] = None
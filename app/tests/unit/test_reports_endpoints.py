@@ -51,13 +51,13 @@ class TestReportAPI(TestCase):
 
         super().setUpClass()
         from main import app
-        from api.api_v1.endpoints import report
+        from api import deps
         from fastapi.testclient import TestClient
         from api.deps import get_current_user
 
         app.dependency_overrides[get_current_user] = TestReportAPI.user_login
         self.patch(
-            report,
+            deps,
             "decode_jwt_token",
             MagicMock(return_value={"user_id": "123"})
         )
@@ -84,14 +84,29 @@ class TestReportAPI(TestCase):
         )
 
         self.patch(
-            report.os.path,
-            "exists",
-            MagicMock(return_value=True)
+            report.os,
+            "stat",
+            MagicMock(return_value=MagicMock())
         )
         response =  self.client.get(f"{TestReportAPI.BASE_URL}/123/", headers={"X-Token": "OK"},
                           params={"token": TestReportAPI.CORRECT_TOKEN})
         assert response.status_code == 200
 
+    def test_get_report_endpoint_from_memory(self):
+        from utils.pdf_cache import remember_pdf
+
+        remember_pdf("123/456", b"%PDF-1.3")
+        response = self.client.get(f"{TestReportAPI.BASE_URL}/456/", headers={"X-Token": "OK"},
+                          params={"token": TestReportAPI.CORRECT_TOKEN})
+        assert response.status_code == 200
+        assert response.content == b"%PDF-1.3"
+        assert response.headers["content-type"] == "application/pdf"
+
+        # Served from memory only once, then from disk
+        response = self.client.get(f"{TestReportAPI.BASE_URL}/456/", headers={"X-Token": "OK"},
+                          params={"token": TestReportAPI.CORRECT_TOKEN})
+        assert response.status_code == 202
+
 
 
     def test_generate_irrigation_report_success(self):
@@ -142,4 +157,6 @@ class TestReportAPI(TestCase):
         mock_bg_task.assert_called_once()
 
         _, kwargs = mock_bg_task.call_args
-        assert kwargs['data'] == file_content
\ No newline at end of file
+        with open(kwargs['data_path'], 'rb') as f:
+            assert f.read() == file_content
+        os.remove(kwargs['data_path'])
\ No newline at end of file
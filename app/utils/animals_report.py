@@ -1,34 +1,60 @@
-import json
 import logging
-import os
+from operator import attrgetter
 from typing import List, Union
 
+import orjson
 from fastapi import HTTPException
 from fpdf.fonts import FontFace
+from pydantic import TypeAdapter
 
-from core import settings
-from utils import EX, add_fonts, decode_jwt_token, decode_dates_filters, get_parcel_info, FarmInfo
+from core import settings, ANIMAL_LIST_URL
+from utils import EX, add_fonts, decode_jwt_token, decode_dates_filters, get_parcel_info, get_parcels_info, FarmInfo, write_pdf, display_pdf_key_values, GEOLOCATOR
 from schemas.animals import *
-from utils.farm_calendar_report import geolocator
 from utils.json_handler import make_get_request
+from utils.upload_handler import read_spooled_upload
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATE_FORMAT = "%d/%m/%Y"
+SEX_LABELS = ("Male", "Female")
+ANIMAL_TABLE_HEADER = (
+    "Date",
+    "Animal",
+    "Description",
+    "Parcel",
+    "Parcel Identifier",
+    "Species",
+    "Sex",
+    "Birthdate",
+    "Invalidated",
+    "Group Member",
+)
+ANIMAL_LIST_ADAPTER = TypeAdapter(List[Animal])
+
 
 def parse_animal_data(data: Union[List[dict], str]) -> Optional[List[Animal]]:
     """
     Parse list of animal records from JSON data
     """
     try:
-        res = [Animal.model_validate(item) for item in data]
-        return res
+        return ANIMAL_LIST_ADAPTER.validate_python(data)
     except Exception as e:
         logger.error(f"Error parsing animal data: {e}")
         return None
 
 
+def _get_parcel_id(animal: Animal) -> Optional[str]:
+    """
+    Return parcel ID of the animal, or None if animal is not on a parcel
+    """
+    parcel_id = animal.hasAgriParcel.id if animal.hasAgriParcel else None
+    if parcel_id and parcel_id.split(":")[3]:
+        return parcel_id.split(":")[-1]
+    return None
+
+
 def create_pdf_from_animals(
     animals: List[Animal],
     token: dict[str, str],
@@ -65,160 +91,82 @@ def create_pdf_from_animals(
 
     if len(animals) == 1:
         an = animals[0]
-        parcel_id = an.hasAgriParcel.id if an.hasAgriParcel else None
+        parcel_id = _get_parcel_id(an)
         address = ""
         farm = FarmInfo(description="", administrator="", vatID="", name="", municipality="", contactPerson="")
         identifier = ""
         if parcel_id:
-            parcel = parcel_id.split(":")[3]
-            if parcel:
-                parcel_data, farm, identifier = get_parcel_info(
-                    parcel_id.split(":")[-1], token, geolocator, identifier_flag=True
-                )
-                address = parcel_data.address
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Created:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(
-            0, 8, f"{an.dateCreated.strftime('%d/%m/%Y')}", ln=True, fill=True
-        )
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Parcel Location:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, address, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Parcel Identifier:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, identifier, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Farm information:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        farm_local = f"Name: {farm.name} | Municipality: {farm.municipality}"
-        pdf.multi_cell(0, 8, farm_local, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Animal:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(
-            0,
-            8,
-            f"Name: {an.name}, Sex: {an.sex}, Birthdate {an.birthdate.strftime('%d/%m/%Y')}",
-            ln=True,
-            fill=True,
-        )
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Species:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, an.species, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Castrated:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, f"{an.isCastrated}", ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Invalidated:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(
-            0,
-            8,
-            f"{an.invalidatedAtTime.strftime('%d/%m/%Y') if an.invalidatedAtTime else 'No'}",
-            ln=True,
-            fill=True,
-        )
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Group Member:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(
-            0,
-            8,
-            f"{an.isMemberOfAnimalGroup.hasName if an.isMemberOfAnimalGroup else 'No'}",
-            ln=True,
-            fill=True,
+            parcel_data, farm, identifier = get_parcel_info(
+                parcel_id, token, GEOLOCATOR, identifier_flag=True
+            )
+            address = parcel_data.address
+
+        group = an.isMemberOfAnimalGroup
+        display_pdf_key_values(
+            pdf,
+            [
+                ("Created:", an.dateCreated.strftime(DATE_FORMAT)),
+                ("Parcel Location:", address),
+                ("Parcel Identifier:", identifier),
+                (
+                    "Farm information:",
+                    f"Name: {farm.name} | Municipality: {farm.municipality}",
+                ),
+                (
+                    "Animal:",
+                    f"Name: {an.name}, Sex: {an.sex}, Birthdate {an.birthdate.strftime(DATE_FORMAT)}",
+                ),
+                ("Species:", an.species),
+                ("Castrated:", f"{an.isCastrated}"),
+                (
+                    "Invalidated:",
+                    an.invalidatedAtTime.strftime(DATE_FORMAT)
+                    if an.invalidatedAtTime
+                    else "No",
+                ),
+                ("Group Member:", f"{group.hasName if group else 'No'}"),
+            ],
         )
 
     if len(animals) > 1:
-        animals.sort(key=lambda x: x.dateCreated)
+        animals.sort(key=attrgetter("dateCreated"))
         pdf.set_fill_color(0, 255, 255)
         with pdf.table(text_align="CENTER", padding=0.5) as table:
-            row = table.row()
             pdf.set_font("FreeSerif", "B", 10)
-            row.cell("Date")
-            row.cell("Animal")
-            row.cell("Description")
-            row.cell("Parcel")
-            row.cell("Parcel Identifier")
-            row.cell("Species")
-            row.cell("Sex")
-            row.cell("Birthdate")
-            row.cell("Invalidated")
-            row.cell("Group Member")
+            table.row(ANIMAL_TABLE_HEADER)
             pdf.set_fill_color(255, 255, 240)
             pdf.set_font("FreeSerif", "", 9)
+            # Animals usually share few parcels, resolve each of them once
+            parcel_cache = get_parcels_info(
+                filter(None, map(_get_parcel_id, animals)),
+                token,
+                GEOLOCATOR,
+                identifier_flag=True,
+            )
             for animal in animals:
-                row = table.row()
-                row.cell(animal.dateCreated.strftime("%d/%m/%Y"))
-                row.cell(animal.name)
-                row.cell(animal.description)
-
                 address = ""
                 identifier = ""
-                parcel_id = animal.hasAgriParcel.id if animal.hasAgriParcel else None
+                parcel_id = _get_parcel_id(animal)
                 if parcel_id:
-                    parcel = parcel_id.split(":")[3]
-                    if parcel:
-                        parcel_data, _, identifier = get_parcel_info(
-                            parcel_id.split(":")[-1],
-                            token,
-                            geolocator,
-                            identifier_flag=True,
-                        )
-                        address = parcel_data.address
-
-                row.cell(address)
-                row.cell(identifier)
-                row.cell(animal.species)
-                row.cell(
-                    f"{'Male' if animal.sex == 0 else 'Female'} | Castrated: {animal.isCastrated}",
-                )
-                row.cell(animal.birthdate.strftime("%d/%m/%Y"))
-                row.cell(
-                    f"{animal.invalidatedAtTime if animal.invalidatedAtTime else 'N/A'}"
-                )
-                row.cell(
-                    f"{animal.isMemberOfAnimalGroup.hasName if animal.isMemberOfAnimalGroup else 'N/A'}"
+                    parcel_data, _, identifier = parcel_cache[parcel_id]
+                    address = parcel_data.address
+
+                group = animal.isMemberOfAnimalGroup
+                # Whole row is handed to fpdf in one call
+                table.row(
+                    (
+                        animal.dateCreated.strftime(DATE_FORMAT),
+                        animal.name,
+                        animal.description,
+                        address,
+                        identifier,
+                        animal.species,
+                        f"{SEX_LABELS[animal.sex != 0]} | Castrated: {animal.isCastrated}",
+                        animal.birthdate.strftime(DATE_FORMAT),
+                        f"{animal.invalidatedAtTime or 'N/A'}",
+                        f"{group.hasName if group else 'N/A'}",
+                    )
                 )
-                pdf.ln(10)
 
     return pdf
 
@@ -227,17 +175,18 @@ def process_animal_data(
     token: dict[str, str],
     pdf_file_name: str,
     params: dict | None = None,
-    data=None,
+    data_path: str | None = None,
     from_date: datetime.date = None,
     to_date: datetime.date = None,
     farm_animal_id: str = None,
-) -> None:
+) -> bytes | None:
     """
     Process animal data and generate PDF report
     """
+    data = read_spooled_upload(data_path)
     if farm_animal_id:
         json_data = make_get_request(
-            url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["animals"]}{farm_animal_id}/',
+            url=f"{ANIMAL_LIST_URL}{farm_animal_id}/",
             token=token,
             params={"format": "json"},
         )
@@ -249,18 +198,18 @@ def process_animal_data(
             params["format"] = "json"
             decode_dates_filters(params, from_date, to_date)
             json_data = make_get_request(
-                url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["animals"]}',
+                url=ANIMAL_LIST_URL,
                 token=token,
                 params=params,
             )
 
         else:
             if not settings.REPORTING_USING_GATEKEEPER:
-                data = json.loads(data)
+                data = orjson.loads(data)
                 json_data = data.get("@graph")
             else:
                 json_data = make_get_request(
-                    url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["animals"]}',
+                    url=ANIMAL_LIST_URL,
                     token=token,
                     params={"format": "json"},
                 )
@@ -276,6 +225,4 @@ def process_animal_data(
         )
 
 
-    pdf_dir = f"{settings.PDF_DIRECTORY}{pdf_file_name}"
-    os.makedirs(os.path.dirname(f"{pdf_dir}.pdf"), exist_ok=True)
-    anima_pdf.output(f"{pdf_dir}.pdf")
+    return write_pdf(anima_pdf, pdf_file_name)
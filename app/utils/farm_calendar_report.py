@@ -1,12 +1,13 @@
 import datetime
-import itertools
-import json
 import logging
-import os
-from typing import Union
+from operator import attrgetter, itemgetter
+from typing import List, Union
+
+import orjson
 from fastapi import HTTPException
+from pydantic import TypeAdapter
 
-from core import settings
+from core import settings, FARMCALENDAR_URLS
 from fpdf import FontFace
 from fpdf.enums import VAlign
 from schemas.compost import *
@@ -15,17 +16,25 @@ from utils import (
     add_fonts,
     decode_dates_filters,
     get_parcel_info,
-    get_farm_operation_data,
-    FarmInfo, display_pdf_parcel_details,
+    get_parcels_info,
+    get_farm_operations_data,
+    FarmInfo, ParcelInfo, display_pdf_parcel_details, display_pdf_key_values,
+    write_pdf,
+    write_pdf_content,
+    GEOLOCATOR,
 )
-from utils.json_handler import make_get_request
-from geopy.geocoders import Nominatim
-
-geolocator = Nominatim(user_agent="reporting_open_agri_app", timeout=5)
+from utils.json_handler import make_get_request, make_get_requests
+from utils.pdf_cache import report_cache_key, load_cached_report
+from utils.upload_handler import read_spooled_upload
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATE_FORMAT = "%d/%m/%Y"
+OBSERVATION_LIST_ADAPTER = TypeAdapter(List[CropObservation])
+OPERATION_LIST_ADAPTER = TypeAdapter(List[Operation])
+MATERIAL_LIST_ADAPTER = TypeAdapter(List[AddRawMaterialOperation])
+
 
 class FarmCalendarData:
     """Class to process and store connected farm calendar data"""
@@ -39,13 +48,9 @@ class FarmCalendarData:
     ):
         self.activity_type = activity_type_info
         try:
-            self.observations = [
-                CropObservation.model_validate(obs) for obs in observations
-            ]
-            self.operations = [Operation.model_validate(act) for act in farm_activities]
-            self.materials = [
-                AddRawMaterialOperation.model_validate(mat) for mat in materials
-            ]
+            self.observations = OBSERVATION_LIST_ADAPTER.validate_python(observations)
+            self.operations = OPERATION_LIST_ADAPTER.validate_python(farm_activities)
+            self.materials = MATERIAL_LIST_ADAPTER.validate_python(materials)
         except Exception as e:
             logger.error(f"Error parsing farm calendar data: {e}")
             raise HTTPException(
@@ -54,6 +59,84 @@ class FarmCalendarData:
             )
 
 
+# Data table row kind, by type of the observation/operation
+TYPE_TO_KIND = {
+    "IrrigationOperation": "irrigated",
+    "CompostTurningOperation": "turned",
+    "AddRawMaterialOperation": "raw",
+    "Observation": "observed",
+}
+
+DATA_ROW_FILL_COLOR = (255, 255, 240)
+# Cells without a style take the current (regular) font of the data table
+DATA_BOLD = FontFace(
+    family="FreeSerif", emphasis="BOLD", size_pt=9, fill_color=DATA_ROW_FILL_COLOR
+)
+
+
+def _get_machine_id(operation: Operation) -> str | None:
+    """
+    ID of the first agricultural machine used in the operation
+    """
+    if not operation.usesAgriculturalMachinery:
+        return None
+    return operation.usesAgriculturalMachinery[0].get("@id", "N/A:N/A").split(":")[-1]
+
+
+def _data_row_period(
+    x: Union[CropObservation, AddRawMaterialOperation]
+) -> tuple[datetime, Union[CropObservation, AddRawMaterialOperation], str]:
+    """
+    Sort key, item and formatted "start - end" period of a data table item
+    """
+    # Observations have no start datetime, they are dated by phenomenonTime
+    start = x.hasStartDatetime or getattr(x, "phenomenonTime", None)
+    start_time = start.strftime(DATE_FORMAT)
+    end_time = x.hasEndDatetime.strftime(DATE_FORMAT) if x.hasEndDatetime else ""
+    return start, x, f"{start_time} - {end_time}"
+
+
+def _get_shared_parcel_id(operations: list[Operation]) -> str | None:
+    """
+    ID of the parcel all operations are done on, None if they do not share one
+    """
+    parcel_ids = {(operation.hasAgriParcel or {}).get("@id") for operation in operations}
+    if len(parcel_ids) != 1:
+        return None
+    parcel_id = parcel_ids.pop()
+    return parcel_id.split(":")[-1] if parcel_id else None
+
+
+def _prefetch_operation_parcels(
+    operations: list[Operation], token: dict[str, str]
+) -> tuple[dict[str, str], dict[str, tuple[ParcelInfo, FarmInfo]]]:
+    """
+    Fetch machines of the operations and parcels of those machines concurrently
+
+    :return: (parcel ID per machine ID, parcel and farm information per parcel ID)
+    """
+    machine_ids = list(
+        {machine_id for machine_id in map(_get_machine_id, operations) if machine_id}
+    )
+    machines = make_get_requests(
+        [
+            f'{FARMCALENDAR_URLS["machines"]}{machine_id}/'
+            for machine_id in machine_ids
+        ],
+        token=token,
+        params={"format": "json"},
+    )
+    machine_parcels = {}
+    for machine_id, machine in zip(machine_ids, machines):
+        parcel = (machine or {}).get("hasAgriParcel") or {}
+        # Machines without a parcel need no parcel lookup
+        if parcel.get("@id"):
+            machine_parcels[machine_id] = parcel["@id"].split(":")[-1]
+
+    parcel_cache = get_parcels_info(machine_parcels.values(), token, GEOLOCATOR)
+    return machine_parcels, parcel_cache
+
+
 def create_farm_calendar_pdf(
     calendar_data: FarmCalendarData, token: dict[str, str], parcel_id: str | None = None
 ) -> EX:
@@ -71,7 +154,7 @@ def create_farm_calendar_pdf(
     pdf.cell(
         0,
         7,
-        f"Data Generated - {datetime.now().strftime('%d/%m/%Y')}",
+        f"Data Generated - {datetime.now().strftime(DATE_FORMAT)}",
         ln=True,
         align="C",
     )
@@ -86,9 +169,13 @@ def create_farm_calendar_pdf(
     pdf.ln(5)
 
     parcel_defined = False
-    if parcel_id and len(calendar_data.operations) > 1:
-        display_pdf_parcel_details(pdf, parcel_id, geolocator, token)
-        parcel_defined = True
+    if len(calendar_data.operations) > 1:
+        if not parcel_id:
+            parcel_id = _get_shared_parcel_id(calendar_data.operations)
+        # Parcel is shown once, instead of in every operation row
+        if parcel_id:
+            display_pdf_parcel_details(pdf, parcel_id, GEOLOCATOR, token)
+            parcel_defined = True
 
     if len(calendar_data.operations) == 1:
         operation = calendar_data.operations[0]
@@ -106,7 +193,7 @@ def create_farm_calendar_pdf(
 
         elif agr_mach_id:
             agr_resp = make_get_request(
-                url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["machines"]}{agr_mach_id}/',
+                url=f'{FARMCALENDAR_URLS["machines"]}{agr_mach_id}/',
                 token=token,
                 params={"format": "json"},
             )
@@ -120,60 +207,40 @@ def create_farm_calendar_pdf(
         farm = FarmInfo(description="", administrator="", vatID="", name="", municipality="", contactPerson="")
         if parcel_id:
             parcel_data, farm = get_parcel_info(
-                parcel_id.split(":")[-1], token, geolocator
+                parcel_id.split(":")[-1], token, GEOLOCATOR
             )
             address = parcel_data.address
 
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Parcel Location:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, address, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Farm information:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        farm_local = f"Name: {farm.name} | Municipality: {farm.municipality}"
-        pdf.multi_cell(0, 8, farm_local, ln=True, fill=True)
-
         cp_id = (
             operation.isOperatedOn.get("@id", "N/A:N/A").split(":")[-1]
             if operation.isOperatedOn
             else "N/A"
         )
         start_date = (
-            operation.hasStartDatetime.strftime("%d/%m/%Y")
+            operation.hasStartDatetime.strftime(DATE_FORMAT)
             if operation.hasStartDatetime
             else operation.phenomenonTime
         )
         end_date = (
-            operation.hasEndDatetime.strftime("%d/%m/%Y")
+            operation.hasEndDatetime.strftime(DATE_FORMAT)
             if operation.hasEndDatetime
             else "N/A"
         )
 
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Details:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, str(operation.details), ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Starting Date:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, str(start_date), ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Ending Date:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, str(end_date), ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Compost Pile:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, str(cp_id), ln=True, fill=True)
+        display_pdf_key_values(
+            pdf,
+            [
+                ("Parcel Location:", address),
+                (
+                    "Farm information:",
+                    f"Name: {farm.name} | Municipality: {farm.municipality}",
+                ),
+                ("Details:", str(operation.details)),
+                ("Starting Date:", str(start_date)),
+                ("Ending Date:", str(end_date)),
+                ("Compost Pile:", str(cp_id)),
+            ],
+        )
 
         pdf.set_font("FreeSerif", "B", 10)
         pdf.cell(40, 8, "Responsible Agent:")
@@ -210,11 +277,17 @@ def create_farm_calendar_pdf(
     pdf.set_fill_color(0, 255, 255)
 
     if len(calendar_data.operations) > 1:
-        calendar_data.operations.sort(key=lambda x: x.hasStartDatetime)
+        calendar_data.operations.sort(key=attrgetter("hasStartDatetime"))
         pdf.set_font("FreeSerif", "B", 12)
         pdf.set_x(15)
         pdf.cell(0, 10, "Operations", ln=True, align='L')
         pdf.ln(5)
+        # Machinery and parcels are fetched concurrently, once per unique ID
+        machine_parcels, parcel_cache = {}, {}
+        if not parcel_defined:
+            machine_parcels, parcel_cache = _prefetch_operation_parcels(
+                calendar_data.operations, token
+            )
         with pdf.table(text_align="CENTER", padding=0.5) as table:
 
             row = table.row()
@@ -237,10 +310,12 @@ def create_farm_calendar_pdf(
                 row.cell(operation.title)
                 row.cell(operation.details)
                 row.cell(
-                    f"{operation.hasStartDatetime.strftime('%d/%m/%Y') if operation.hasStartDatetime else 'N/A'}",
+                    operation.hasStartDatetime.strftime(DATE_FORMAT)
+                    if operation.hasStartDatetime
+                    else "N/A"
                 )
                 row.cell(
-                    f"{operation.hasEndDatetime.strftime('%d/%m/%Y') if operation.hasEndDatetime else 'N/A'} ",
+                    f"{operation.hasEndDatetime.strftime(DATE_FORMAT) if operation.hasEndDatetime else 'N/A'} ",
                 )
                 row.cell(operation.responsibleAgent)
                 machinery_ids = ""
@@ -262,33 +337,19 @@ def create_farm_calendar_pdf(
                             for machinery in operation.usesAgriculturalMachinery
                         ]
                     )
-                    agr_mach_id = (
-                        operation.usesAgriculturalMachinery[0]
-                        .get("@id", "N/A:N/A")
-                        .split(":")[-1]
-                    )
-                    agr_resp = make_get_request(
-                        url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["machines"]}{agr_mach_id}/',
-                        token=token,
-                        params={"format": "json"},
-                    )
-                    if agr_resp:
-                        parcel_id = (
-                            agr_resp.get("hasAgriParcel", {})
-                            .get("@id", "N/A:N/A")
-                            .split(":")[-1]
-                        )
-                        parcel_data, farm = get_parcel_info(
-                            parcel_id, token, geolocator
+                    if not parcel_defined:
+                        parcel_id = machine_parcels.get(
+                            _get_machine_id(operation)
                         )
-                        address = parcel_data.address
+                        if parcel_id:
+                            parcel_data, farm = parcel_cache[parcel_id]
+                            address = parcel_data.address
 
                 row.cell(f"{machinery_ids}")
                 if not parcel_defined:
                     row.cell(address)
                     farm_local = f"Name: {farm.name} | Municipality: {farm.municipality}"
                     row.cell(farm_local)
-                operation = calendar_data.operations[0]
                 cp = (
                     operation.isOperatedOn.get("@id").split(":")[3]
                     if operation.isOperatedOn
@@ -302,10 +363,8 @@ def create_farm_calendar_pdf(
     merged_data = calendar_data.observations + calendar_data.materials
 
     if merged_data:
-        merged_data.sort(
-            key=lambda item: getattr(item, "hasStartDatetime")
-            or getattr(item, "phenomenonTime", None)
-        )
+        # Dates are formatted once per item, also when it spans several rows
+        data_rows = sorted(map(_data_row_period, merged_data), key=itemgetter(0))
         pdf.ln()
         pdf.set_fill_color(0, 255, 255)
 
@@ -313,13 +372,6 @@ def create_farm_calendar_pdf(
         pdf.set_x(15)
         pdf.cell(0, 10, "Data Table", ln=True)
         pdf.ln(5)
-        types = {
-            "irrigated": "IrrigationOperation",
-            "turned": "CompostTurningOperation",
-            "raw": "AddRawMaterialOperation",
-            "observed": "Observation",
-        }
-
         with pdf.table(text_align="CENTER", padding=0.5, v_align=VAlign.M) as table:
             row = table.row()
             pdf.set_font("FreeSerif", "B", 10)
@@ -330,89 +382,51 @@ def create_farm_calendar_pdf(
             row.cell("Property")
             row.cell("Details")
             pdf.set_font("FreeSerif", "", 9)
-            for x in merged_data:
+            pdf.set_fill_color(*DATA_ROW_FILL_COLOR)
+            for _, x, period in data_rows:
                 row = table.row()
-                pdf.set_fill_color(255, 255, 240)
-
-                start_time = (
-                    x.hasStartDatetime.strftime("%d/%m/%Y")
-                    if x.hasStartDatetime
-                    else x.phenomenonTime.strftime("%d/%m/%Y")
-                )
-                end_time = (
-                    x.hasEndDatetime.strftime("%d/%m/%Y") if x.hasEndDatetime else ""
-                )
-                row.cell(f"{start_time} - {end_time}")
-
-                irrigated = types.get("irrigated") == x.type
-                raw = types.get("raw") == x.type
-                observed = types.get("observed") == x.type
-                turned = types.get("turned") == x.type
+                row.cell(period)
+
+                kind = TYPE_TO_KIND.get(x.type)
+                irrigated = kind == "irrigated"
+                raw = kind == "raw"
+                observed = kind == "observed"
+                turned = kind == "turned"
+
+                materials = x.hasCompostMaterial if raw else None
+                if materials and len(materials) > 1:
+                    # One row per material, the first one finishes the current row
+                    for i, qv in enumerate(materials):
+                        if i:
+                            row = table.row()
+                            row.cell(period)
+                        row.cell()
+                        row.cell()
+                        row.cell(f"{qv.quantityValue.numericValue} ({qv.quantityValue.unit})")
+                        row.cell(qv.typeName)
+                        row.cell(x.details)
+                    continue
 
                 value = ""
                 prop = ""
-
-                generate_inner_row = False
                 if irrigated:
                     value = (
                         f"{x.hasAppliedAmount.numericValue} ({x.hasAppliedAmount.unit})"
                     )
-                if raw:
-                    if x.hasCompostMaterial:
-                        for i, qv in enumerate(x.hasCompostMaterial):
-                            tmp_val = f"{qv.quantityValue.numericValue} ({qv.quantityValue.unit})"
-                            value = tmp_val
-                            prop = qv.typeName
-                            if len(x.hasCompostMaterial) > 1:
-                                if i < (len(x.hasCompostMaterial)):
-                                    if i == 0:
-                                        # Finish current row
-                                        row.cell()
-                                        row.cell()
-                                        row.cell(tmp_val)
-                                        row.cell(qv.typeName)
-                                        row.cell(x.details)
-                                    else:
-                                        # Create new row
-                                        row = table.row()
-                                        start_time = (
-                                            x.hasStartDatetime.strftime("%d/%m/%Y")
-                                            if x.hasStartDatetime
-                                            else x.phenomenonTime.strftime("%d/%m/%Y")
-                                        )
-                                        end_time = (
-                                            x.hasEndDatetime.strftime("%d/%m/%Y")
-                                            if x.hasEndDatetime
-                                            else ""
-                                        )
-                                        row.cell(f"{start_time} - {end_time}")
-                                        row.cell()
-                                        row.cell()
-                                        row.cell(tmp_val)
-                                        row.cell(qv.typeName)
-                                        row.cell(x.details)
-                                        generate_inner_row = True
-
-                if not generate_inner_row:
-                    if observed:
-                        prop = x.observedProperty
-                        value = f"{x.hasResult.hasValue} ({x.hasResult.unit})"
-
-                    ir = "Yes" if irrigated else ""
-                    tr = "Yes" if turned else ""
-                    if ir == "Yes":
-                        pdf.set_font("FreeSerif", "B", 9)
-                    row.cell(ir)
-                    pdf.set_font("FreeSerif", "", 9)
-
-                    if tr == "Yes":
-                        pdf.set_font("FreeSerif", "B", 9)
-                    row.cell(tr)
-                    pdf.set_font("FreeSerif", "", 9)
-
-                    row.cell(value)
-                    row.cell(prop)
-                    row.cell(x.details)
+                elif materials:
+                    qv = materials[0]
+                    value = f"{qv.quantityValue.numericValue} ({qv.quantityValue.unit})"
+                    prop = qv.typeName
+                elif observed:
+                    prop = x.observedProperty
+                    value = f"{x.hasResult.hasValue} ({x.hasResult.unit})"
+
+                row.cell("Yes" if irrigated else "", style=DATA_BOLD if irrigated else None)
+                row.cell("Yes" if turned else "", style=DATA_BOLD if turned else None)
+
+                row.cell(value)
+                row.cell(prop)
+                row.cell(x.details)
 
     pdf.ln(10)
 
@@ -423,25 +437,41 @@ def process_farm_calendar_data(
     token: dict[str, str],
     pdf_file_name: str,
     calendar_activity_type: str = None,
-    data=None,
+    data_path: str | None = None,
     operation_id: str = None,
     from_date: datetime.date = None,
     to_date: datetime.date = None,
     parcel_id: str = None,
-) -> None:
+) -> bytes | None:
     """
     Process farm calendar data and generate PDF report
     """
     try:
+        data = read_spooled_upload(data_path)
+        cache_key = None
         if not data:
             if not settings.REPORTING_USING_GATEKEEPER:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Data file must be provided if gatekeeper is not used.",
                 )
+            if settings.REPORTING_PDF_CACHE_TTL:
+                # Same report for the same user and filters, skip fetching and rendering
+                cache_key = report_cache_key(
+                    "farm_calendar",
+                    pdf_file_name.split("/")[0],
+                    operation_id,
+                    from_date,
+                    to_date,
+                    parcel_id,
+                    calendar_activity_type,
+                )
+                content = load_cached_report(cache_key)
+                if content is not None:
+                    return write_pdf_content(content, pdf_file_name)
             params = {"format": "json", "activity_type": ""}
-            operation_url = f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["operations"]}'
-            obs_url = f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["observations"]}'
+            operation_url = FARMCALENDAR_URLS["operations"]
+            obs_url = FARMCALENDAR_URLS["observations"]
 
             observations = []
             materials = []
@@ -454,7 +484,7 @@ def process_farm_calendar_data(
                     if calendar_activity_type.strip() != "Compost Operation":
                         params["name"] = calendar_activity_type
                         farm_activity_type_info = make_get_request(
-                            url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["activity_types"]}',
+                            url=FARMCALENDAR_URLS["activity_types"],
                             token=token,
                             params=params,
                         )
@@ -480,15 +510,13 @@ def process_farm_calendar_data(
                             params=params,
                         )
                         if operations:
-                            for o in operations:
-                                id = o["@id"].split(":")[3]
-                                get_farm_operation_data(
-                                    id=id,
-                                    materials=materials,
-                                    params=params,
-                                    observations=observations,
-                                    token=token,
-                                )
+                            get_farm_operations_data(
+                                ids=[o["@id"].split(":")[3] for o in operations],
+                                materials=materials,
+                                params=params,
+                                observations=observations,
+                                token=token,
+                            )
 
             else:
                 operation_url = f"{operation_url}{operation_id}/"
@@ -508,7 +536,7 @@ def process_farm_calendar_data(
                         id = operations[0]["activityType"]["@id"].split(":")[3]
                         if id:
                             farm_activity_type_info = make_get_request(
-                                url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["activity_types"]}{id}/',
+                                url=f'{FARMCALENDAR_URLS["activity_types"]}{id}/',
                                 token=token,
                                 params=params,
                             )
@@ -517,8 +545,8 @@ def process_farm_calendar_data(
                     # Filter Observations by date when operation ID is used
                     params_copy = params.copy()
                     decode_dates_filters(params_copy, from_date, to_date)
-                    get_farm_operation_data(
-                        id=operation_id,
+                    get_farm_operations_data(
+                        ids=[operation_id],
                         materials=materials,
                         params=params_copy,
                         observations=observations,
@@ -532,25 +560,21 @@ def process_farm_calendar_data(
                 materials=materials,
             )
         else:
-            dt = json.loads(data)
+            dt = orjson.loads(data)
             if dt:
                 farm_act = dt.get("@graph", [])
-                obs = [x.get("hasMeasurement") for x in farm_act]
-                materials = [x.get("hasNestedOperation") for x in farm_act]
-
-                obs = list(itertools.chain.from_iterable(obs)) if obs else []
-                materials = (
-                    list(itertools.chain.from_iterable(materials)) if obs else []
-                )
-
-                try:
-                    obs = [o["hasMember"] for o in obs]
-                    obs = list(itertools.chain.from_iterable(obs)) if obs else []
-                except Exception:
-                    # If this occurs it means we use new data type (not old)
-                    # if Except is not enter data used is using old format (old JSONLD example)
-                    # This way it is backward compatible (logger.info should stay, because it is not error)
-                    logger.info("Data is new format type, proceed as normal.")
+                obs = []
+                materials = []
+                for x in farm_act:
+                    for measurement in x.get("hasMeasurement") or ():
+                        # Old JSONLD format groups observations in hasMember of the measurement,
+                        # new format lists them directly (backward compatible)
+                        members = measurement.get("hasMember")
+                        if members is None:
+                            obs.append(measurement)
+                        else:
+                            obs.extend(members)
+                    materials.extend(x.get("hasNestedOperation") or ())
 
                 calendar_data = FarmCalendarData(
                     activity_type_info=calendar_activity_type,
@@ -567,9 +591,7 @@ def process_farm_calendar_data(
                 )
 
         pdf = create_farm_calendar_pdf(calendar_data, token, parcel_id)
-        pdf_dir = f"{settings.PDF_DIRECTORY}{pdf_file_name}"
-        os.makedirs(os.path.dirname(f"{pdf_dir}.pdf"), exist_ok=True)
-        pdf.output(f"{pdf_dir}.pdf")
+        return write_pdf(pdf, pdf_file_name, cache_key)
 
     except Exception as e:
         raise HTTPException(
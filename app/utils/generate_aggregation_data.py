@@ -1,130 +1,216 @@
-import io
-from typing import List
+from collections import defaultdict
+from datetime import datetime
+from typing import List, NamedTuple, Optional
 
-import pandas as pd
-import matplotlib
-from core.config import settings
-from utils import get_pesticide
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import numpy as np
 import matplotlib.dates as mdates
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from core.config import settings
+from utils import get_pesticides
 
 from schemas import IrrigationOperation, CropProtectionOperation
 
+GRAPH_DPI = 90
+ANNOTATE_ALL_MAX_POINTS = 30
+ANNOTATE_TOP_POINTS = 5
 
-def get_pest_from_obj(pt: CropProtectionOperation, token: dict | str):
-    pest_name = ""
-    if not settings.REPORTING_USING_GATEKEEPER:
-        return pest_name
+
+def get_pest_id(pt: CropProtectionOperation) -> str | None:
+    """
+    ID of the pesticide used in the operation, or None if it is not set
+    """
     pest_id = pt.usesPesticide.get("@id", None) if pt.usesPesticide else None
-    if pest_id:
-        pest_id = pest_id.split(":")[3]
-        pest = get_pesticide(pest_id, token)
-        pest_name = pest.get("hasCommercialName") if pest else ""
-    return pest_name
+    return pest_id.split(":")[3] if pest_id else None
 
 
-def pesticides_aggregation(
+def get_pest_names(
     pests: List[CropProtectionOperation], token: dict | str
-) -> pd.DataFrame:
-    data_for_df = []
-    for pt in pests:
-        data_for_df.append(
-            {
-                "Dose": pt.hasAppliedAmount.numericValue if pt.hasAppliedAmount else 0,
-                "Pesticide": get_pest_from_obj(pt, token),
-                "Unit": pt.hasAppliedAmount.unit if pt.hasAppliedAmount else "",
-            }
-        )
-    df = pd.DataFrame(data_for_df)
-    pesticide_sums = df.groupby(["Pesticide", "Unit"])["Dose"].sum().reset_index()
-    return pesticide_sums
-
+) -> dict[str, Optional[str]]:
+    """
+    Commercial names of the pesticides used in operations, fetched once per pesticide
 
-def prepare_df_for_calculations(
-    irrigation_reports: List[IrrigationOperation],
-) -> pd.DataFrame:
-    data_for_df = []
-    for irrig in irrigation_reports:
-        data_for_df.append(
-            {
-                "Started Date": irrig.hasStartDatetime,
-                "Dose": irrig.hasAppliedAmount.numericValue
-                if irrig.hasAppliedAmount
-                else 0,
-            }
-        )
-    df = pd.DataFrame(data_for_df)
-    return df
+    :return: Name per pesticide ID, empty if gatekeeper is not used
+    """
+    if not settings.REPORTING_USING_GATEKEEPER:
+        return {}
+    pesticides = get_pesticides(
+        {pest_id for pest_id in map(get_pest_id, pests) if pest_id}, token
+    )
+    return {
+        pest_id: pest.get("hasCommercialName") if pest else ""
+        for pest_id, pest in pesticides.items()
+    }
 
 
-def generate_total_volume_graph(df: pd.DataFrame, parcel_area: int) -> io.BytesIO:
-    df["Started Date"] = pd.to_datetime(df["Started Date"], format="%d/%m/%Y")
-    df["Total Volume"] = df["Dose"] * parcel_area
-    df = df.sort_values(by="Started Date")
-    plt.figure(figsize=(14, 7))
-    plt.plot(df["Started Date"], df["Total Volume"], marker="o", color="#8B8000")
+class PesticideTotal(NamedTuple):
+    pesticide: str
+    unit: str
+    dose: float
 
-    for i, txt in enumerate(df["Total Volume"]):
-        plt.annotate(
-            txt,
-            (df["Started Date"].iloc[i], df["Total Volume"].iloc[i]),
-            textcoords="offset points",
-            xytext=(0, 5),
-            ha="center",
-        )
 
-    plt.title("Total Volume of applied water per irrigation activity", fontsize=16)
-    plt.ylabel("Total Volume (m3)", fontsize=12)
-    plt.xlabel("Date", fontsize=12)
-    plt.grid(True, linestyle="--", alpha=0.6)
-    plt.xticks(rotation=45)
+class IrrigationSeries(NamedTuple):
+    """Start dates and doses (m3/Ha) of irrigation operations, in operations order"""
 
-    ax = plt.gca()
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%d/%m/%Y"))
+    dates: List[Optional[datetime]]
+    doses: np.ndarray
 
-    plt.tight_layout()
-    image_mem = io.BytesIO()
-    plt.savefig(image_mem, format="png")
-    plt.close()
-    return image_mem
 
+def pesticides_aggregation(
+    pests: List[CropProtectionOperation],
+    token: dict | str,
+    pest_names: Optional[dict[str, Optional[str]]] = None,
+) -> List[PesticideTotal]:
+    """
+    Total dose per pesticide and unit, ordered by pesticide and unit
+
+    :param pest_names: Result of get_pest_names for the same operations, fetched if not given
+    """
+    if pest_names is None:
+        pest_names = get_pest_names(pests, token)
+    totals = defaultdict(float)
+    for pt in pests:
+        pesticide = pest_names.get(get_pest_id(pt), "")
+        # Operations with unknown pesticide name are left out of the totals
+        if pesticide is None:
+            continue
+        unit = pt.hasAppliedAmount.unit if pt.hasAppliedAmount else ""
+        totals[(pesticide, unit)] += (
+            pt.hasAppliedAmount.numericValue if pt.hasAppliedAmount else 0
+        )
+    return [
+        PesticideTotal(pesticide, unit, dose)
+        for (pesticide, unit), dose in sorted(totals.items())
+    ]
 
-def generate_amount_per_hectare(df: pd.DataFrame) -> io.BytesIO:
-    df["Started Date"] = pd.to_datetime(df["Started Date"], format="%d/%m/%Y")
-    plt.figure(figsize=(14, 7))
-    plt.plot(df["Started Date"], df["Dose"], marker="o", color="grey")
 
-    for i, txt in enumerate(df["Dose"]):
-        plt.annotate(
-            txt,
-            (df["Started Date"].iloc[i], df["Dose"].iloc[i]),
+def prepare_df_for_calculations(
+    irrigation_reports: List[IrrigationOperation],
+) -> IrrigationSeries:
+    return IrrigationSeries(
+        dates=[irrig.hasStartDatetime for irrig in irrigation_reports],
+        doses=np.fromiter(
+            (
+                irrig.hasAppliedAmount.numericValue if irrig.hasAppliedAmount else 0
+                for irrig in irrigation_reports
+            ),
+            dtype=float,
+            count=len(irrigation_reports),
+        ),
+    )
+
+
+def _dated_points(dates: List[Optional[datetime]], values: np.ndarray) -> tuple[list, np.ndarray]:
+    """
+    Points with a start date, operations without one can not be placed on the date axis
+    """
+    indexes = [i for i, date in enumerate(dates) if date is not None]
+    return [dates[i] for i in indexes], values[indexes]
+
+
+def _annotated_indexes(dates: list, values: np.ndarray) -> list[int]:
+    """
+    Points labeled with their value. Long series only get their largest values,
+    minimum and latest point labeled, labels of every point would overlap anyway.
+    """
+    if len(values) <= ANNOTATE_ALL_MAX_POINTS:
+        return list(range(len(values)))
+    indexes = set(np.argsort(values, kind="stable")[-ANNOTATE_TOP_POINTS:].tolist())
+    indexes.add(int(np.argmin(values)))
+    indexes.add(max(range(len(dates)), key=dates.__getitem__))
+    return sorted(indexes)
+
+
+def _plot_series(
+    ax: Axes, dates: list, values: np.ndarray, title: str, ylabel: str, color: str
+) -> None:
+    ax.plot(dates, values, marker="o", color=color)
+
+    for i in _annotated_indexes(dates, values):
+        ax.annotate(
+            values[i],
+            (dates[i], values[i]),
             textcoords="offset points",
             xytext=(0, 5),
             ha="center",
         )
 
-    plt.title("Applied amount of water per hectare", fontsize=16)
-    plt.ylabel("Dose (m3/Ha)", fontsize=12)
-    plt.xlabel("Date", fontsize=12)
-    plt.grid(True, linestyle="--", alpha=0.6)
-    plt.xticks(rotation=45)
-
-    ax = plt.gca()
+    ax.set_title(title, fontsize=16)
+    ax.set_ylabel(ylabel, fontsize=12)
+    ax.set_xlabel("Date", fontsize=12)
+    ax.grid(True, linestyle="--", alpha=0.6)
+    ax.tick_params(axis="x", labelrotation=45)
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%d/%m/%Y"))
 
-    plt.tight_layout()
-    image_mem = io.BytesIO()
-    plt.savefig(image_mem, format="png")
-    plt.close()
-    return image_mem
-
 
-def generate_aggregation_table_data(df: pd.DataFrame) -> dict:
+def _rasterize(fig: Figure) -> Image.Image:
+    """
+    Draw figure on its Agg canvas, the image is embedded as is without PNG encoding
+    """
+    fig.tight_layout()
+    fig.canvas.draw()
+    # Figure is opaque, RGB copy also keeps the image valid after the figure is reused
+    return Image.frombuffer(
+        "RGBA", fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1
+    ).convert("RGB")
+
+
+def generate_total_volume_graph(
+    data: IrrigationSeries, parcel_area: int, ax: Axes
+) -> Image.Image:
+    total_volume = data.doses * parcel_area
+    dates, values = _dated_points(data.dates, total_volume)
+    order = sorted(range(len(dates)), key=dates.__getitem__)
+    _plot_series(
+        ax,
+        [dates[i] for i in order],
+        values[order],
+        "Total Volume of applied water per irrigation activity",
+        "Total Volume (m3)",
+        "#8B8000",
+    )
+    return _rasterize(ax.figure)
+
+
+def generate_amount_per_hectare(data: IrrigationSeries, ax: Axes) -> Image.Image:
+    dates, values = _dated_points(data.dates, data.doses)
+    _plot_series(
+        ax,
+        dates,
+        values,
+        "Applied amount of water per hectare",
+        "Dose (m3/Ha)",
+        "grey",
+    )
+    return _rasterize(ax.figure)
+
+
+def generate_irrigation_graphs(
+    data: IrrigationSeries, parcel_area: int
+) -> tuple[Image.Image, Image.Image]:
+    """
+    Total volume and per hectare graphs, drawn on one reused figure.
+    Figure is not registered with pyplot, so reports can draw graphs from several threads at once.
+
+    :return: (total volume graph, amount per hectare graph)
+    """
+    fig = Figure(figsize=(14, 7), dpi=GRAPH_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    total_volume_graph = generate_total_volume_graph(data, parcel_area, ax)
+    ax.cla()
+    amount_per_hc_graph = generate_amount_per_hectare(data, ax)
+    return total_volume_graph, amount_per_hc_graph
+
+
+def generate_aggregation_table_data(data: IrrigationSeries, parcel_area: int) -> dict:
+    doses = data.doses
+    total_volume = doses * parcel_area
     return {
-        "Volume of applied water": [df["Dose"].sum(), df["Total Volume"].sum()],
-        "Average dose": [df["Dose"].mean(), df["Total Volume"].mean()],
-        "Maximum Dose": [df["Dose"].max(), df["Total Volume"].max()],
-        "Minimum Dose": [df["Dose"].min(), df["Total Volume"].min()],
+        "Volume of applied water": [doses.sum(), total_volume.sum()],
+        "Average dose": [doses.mean(), total_volume.mean()],
+        "Maximum Dose": [doses.max(), total_volume.max()],
+        "Minimum Dose": [doses.min(), total_volume.min()],
     }
@@ -1,30 +1,37 @@
 import io
-import json
 import logging
-import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import attrgetter
 from typing import Optional, List
 
+import orjson
 from fastapi import HTTPException
+from pydantic import TypeAdapter
 
-from core import settings
+from core import settings, FARMCALENDAR_URLS
 from schemas import IrrigationOperation, FertilizationOperation, CropProtectionOperation
-from utils.satellite_image_get import fetch_wms_image, SatelliteImageException
-from utils import EX, add_fonts, decode_dates_filters, get_parcel_info, display_pdf_parcel_details, FarmInfo
-from utils.farm_calendar_report import geolocator
+from utils.satellite_image_get import fetch_wms_image_cached, SatelliteImageException
+from utils import EX, add_fonts, decode_dates_filters, get_parcel_info, get_parcels_info, display_pdf_parcel_details, display_pdf_key_values, FarmInfo, write_pdf, GEOLOCATOR
 from utils.generate_aggregation_data import (
-    generate_total_volume_graph,
-    generate_amount_per_hectare,
+    generate_irrigation_graphs,
     prepare_df_for_calculations,
     generate_aggregation_table_data,
-    get_pest_from_obj,
+    get_pest_id,
+    get_pest_names,
     pesticides_aggregation,
 )
 from utils.json_handler import make_get_request
+from utils.upload_handler import read_spooled_upload
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATE_FORMAT = "%d/%m/%Y"
+IRRIGATION_LIST_ADAPTER = TypeAdapter(List[IrrigationOperation])
+FERTILIZATION_LIST_ADAPTER = TypeAdapter(List[FertilizationOperation])
+CROP_PROTECTION_LIST_ADAPTER = TypeAdapter(List[CropProtectionOperation])
+
 
 def parse_irrig_fert_operations(
     data: dict,
@@ -38,11 +45,11 @@ def parse_irrig_fert_operations(
     """
     try:
         if irrigation_flag:
-            return [IrrigationOperation.model_validate(item) for item in data]
+            return IRRIGATION_LIST_ADAPTER.validate_python(data)
         elif fertilization_flag:
-            return [FertilizationOperation.model_validate(item) for item in data]
+            return FERTILIZATION_LIST_ADAPTER.validate_python(data)
         else:
-            return [CropProtectionOperation.model_validate(item) for item in data]
+            return CROP_PROTECTION_LIST_ADAPTER.validate_python(data)
     except Exception as e:
         logger.error(f"Error parsing irrigation/fertilization operations: {e}")
         raise HTTPException(
@@ -51,6 +58,55 @@ def parse_irrig_fert_operations(
         )
 
 
+def _get_operated_parcel_id(
+    operation: IrrigationOperation | FertilizationOperation | CropProtectionOperation,
+) -> Optional[str]:
+    """
+    Return ID of the parcel the operation was done on, or None if it is not set
+    """
+    parcel_id = operation.operatedOn.get("@id") if operation.operatedOn else None
+    if parcel_id and parcel_id.split(":")[3]:
+        return parcel_id.split(":")[-1]
+    return None
+
+
+def _prefetch_parcel(parcel_id: str, token: dict[str, str]) -> None:
+    """
+    Warm parcel information and satellite image caches used by the parcel details of the report
+    """
+    try:
+        parcel_data, _ = get_parcel_info(parcel_id, token, GEOLOCATOR)
+        if parcel_data.long != 0 and parcel_data.lat != 0:
+            fetch_wms_image_cached(parcel_data.lat, parcel_data.long)
+    except Exception as e:
+        # Report fetches them again (and handles the error) while rendering
+        logger.info(f"Prefetching parcel {parcel_id} failed. {e}")
+
+
+def _operation_period(
+    operation: IrrigationOperation | FertilizationOperation | CropProtectionOperation,
+) -> str:
+    """
+    Formatted "start - end" period of the operation
+    """
+    start_time = (
+        operation.hasStartDatetime.strftime(DATE_FORMAT)
+        if operation.hasStartDatetime
+        else ""
+    )
+    end_time = (
+        operation.hasEndDatetime.strftime(DATE_FORMAT) if operation.hasEndDatetime else ""
+    )
+    return f"{start_time} - {end_time}"
+
+
+def _parcel_cells(address: str, identifier: str, farm: FarmInfo) -> tuple[str, str, str]:
+    """
+    Parcel, parcel identifier and farm cells of an operation table row
+    """
+    return address, identifier, f"Name: {farm.name} | Municipality: {farm.municipality}"
+
+
 def create_pdf_from_operations(
     operations: List[IrrigationOperation]
     | List[FertilizationOperation | CropProtectionOperation],
@@ -72,7 +128,7 @@ def create_pdf_from_operations(
 
     EX.ln(pdf)
 
-    today = datetime.now().strftime("%d/%m/%Y")
+    today = datetime.now().strftime(DATE_FORMAT)
     pdf.set_font("FreeSerif", "B", 14)
     title = "Pesticide"
     if irrigation_flag:
@@ -103,6 +159,7 @@ def create_pdf_from_operations(
     identifier = ""
     farm = FarmInfo(description="", administrator="", vatID="", name="", municipality="", contactPerson="")
     parcel_defined = None
+    pest_names = None
     from_date_local, to_date_local = today, None
     if from_date:
         from_date_local = from_date.strftime("%Y-%m-%d")
@@ -117,104 +174,56 @@ def create_pdf_from_operations(
     pdf.set_x((pdf.w/4)-30  )
     pdf.cell(30, 8, "1. Farm Details", align='L')
     pdf.multi_cell(0, 8, f"", ln=True, fill=False)
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(40, 8, "Reporting Period")
-    pdf.set_font("FreeSerif", "", 10)
-    pdf.multi_cell(0, 8, f"{from_date_local} / {to_date_local}", ln=True, fill=True)
+    display_pdf_key_values(
+        pdf, [("Reporting Period", f"{from_date_local} / {to_date_local}")]
+    )
 
     if parcel_id:
-        parcel_data = display_pdf_parcel_details(pdf, parcel_id, geolocator, token)
+        parcel_data = display_pdf_parcel_details(pdf, parcel_id, GEOLOCATOR, token)
         if parcel_data.long != 0 and parcel_data.lat != 0:
             try:
-                image_bytes = fetch_wms_image(parcel_data.lat, parcel_data.long)
+                image_bytes = fetch_wms_image_cached(parcel_data.lat, parcel_data.long)
                 image_file = io.BytesIO(image_bytes)
                 pdf.ln(2)
                 x_start = (pdf.w - 100) / 2
                 pdf.set_x(x_start)
-                pdf.image(image_file, type="png", w=100)
+                pdf.image(image_file, w=100)
             except SatelliteImageException:
                 logger.info("Satellite image issue happened, continue without image.")
         parcel_defined = True
 
     if len(operations) == 1:
         op = operations[0]
-        if not parcel_defined:
-            parcel_id = op.operatedOn.get("@id") if op.operatedOn else None
-            identifier = ""
-            if parcel_id:
-                parcel = parcel_id.split(":")[3] if op.operatedOn else None
-                if parcel:
-                    parcel_data, farm, identifier = get_parcel_info(
-                        parcel_id.split(":")[-1],
-                        token,
-                        geolocator,
-                        identifier_flag=True,
-                    )
-                    address = parcel_data.address
+        # With a parcel filter its details are already displayed above
+        operated_parcel_id = None if parcel_defined else _get_operated_parcel_id(op)
+        if operated_parcel_id:
+            parcel_data, farm, identifier = get_parcel_info(
+                operated_parcel_id,
+                token,
+                GEOLOCATOR,
+                identifier_flag=True,
+            )
+            address = parcel_data.address
         start_time = (
-            op.hasStartDatetime.strftime("%d/%m/%Y") if op.hasStartDatetime else ""
+            op.hasStartDatetime.strftime(DATE_FORMAT) if op.hasStartDatetime else ""
         )
-        end_time = op.hasEndDatetime.strftime("%d/%m/%Y") if op.hasEndDatetime else ""
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Star-End :")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, f"{start_time}-{end_time}", ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Parcel Location:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, address, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(40, 8, "Parcel Identifier:")
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, identifier, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Farm Location:",
+        end_time = op.hasEndDatetime.strftime(DATE_FORMAT) if op.hasEndDatetime else ""
+        display_pdf_key_values(
+            pdf,
+            [
+                ("Star-End :", f"{start_time}-{end_time}"),
+                ("Parcel Location:", address),
+                ("Parcel Identifier:", identifier),
+                (
+                    "Farm Location:",
+                    f"Name: {farm.name} | Municipality: {farm.municipality}",
+                ),
+                ("Administrator:", farm.administrator),
+                ("Contact Person:", farm.contactPerson),
+                ("Farm vat:", farm.vatID),
+                ("Farm Description:", farm.description),
+            ],
         )
-        pdf.set_font("FreeSerif", "", 10)
-        farm_local = f"Name: {farm.name} | Municipality: {farm.municipality}"
-        pdf.multi_cell(0, 8, farm_local, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Administrator:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, farm.administrator, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Contact Person:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, farm.contactPerson, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Farm vat:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, farm.vatID, ln=True, fill=True)
-
-        pdf.set_font("FreeSerif", "B", 10)
-        pdf.cell(
-            40,
-            8,
-            "Farm Description:",
-        )
-        pdf.set_font("FreeSerif", "", 10)
-        pdf.multi_cell(0, 8, farm.description, ln=True, fill=True)
 
         pdf.set_font("FreeSerif", "B", 10)
         pdf.cell(
@@ -231,8 +240,9 @@ def create_pdf_from_operations(
         )
 
     if len(operations) > 1:
-        if not data_used:
-            operations.sort(key=lambda x: x.hasStartDatetime)
+        # Uploaded data keeps its order, farm calendar data may already be ordered upstream
+        if not data_used and not settings.REPORTING_FARMCALENDAR_ORDERING:
+            operations.sort(key=attrgetter("hasStartDatetime"))
         pdf.set_font("FreeSerif", "B", 15)
         pdf.ln(2)
         pdf.set_x((pdf.w / 4) - 30)
@@ -258,41 +268,37 @@ def create_pdf_from_operations(
                 row.cell("Pesticide")
             pdf.set_font("FreeSerif", "", 9)
             pdf.set_fill_color(255, 255, 240)
+            # Operations usually share few parcels, resolve and format each of them once
+            parcel_cells = {}
+            no_parcel_cells = ()
+            if not parcel_defined:
+                parcel_cells = {
+                    parcel_id: _parcel_cells(parcel_data.address, identifier, farm)
+                    for parcel_id, (parcel_data, farm, identifier) in get_parcels_info(
+                        filter(None, map(_get_operated_parcel_id, operations)),
+                        token,
+                        GEOLOCATOR,
+                        identifier_flag=True,
+                    ).items()
+                }
+                no_parcel_cells = _parcel_cells(
+                    "",
+                    "",
+                    FarmInfo(description="", administrator="", vatID="", name="", municipality="", contactPerson=""),
+                )
+            if not irrigation_flag and not fertilization_flag:
+                # Fetched once per pesticide, reused by the final report
+                pest_names = get_pest_names(operations, token)
             for op in operations:
                 # Operation Header
                 row = table.row()
-                start_time = (
-                    op.hasStartDatetime.strftime("%d/%m/%Y")
-                    if op.hasStartDatetime
-                    else ""
-                )
-                end_time = (
-                    op.hasEndDatetime.strftime("%d/%m/%Y") if op.hasEndDatetime else ""
-                )
-                row.cell(f"{start_time} - {end_time}")
+                row.cell(_operation_period(op))
 
                 if not parcel_defined:
-                    parcel_id = op.operatedOn.get("@id") if op.operatedOn else None
-                    address = ""
-                    farm = FarmInfo(description="", administrator="", vatID="", name="", municipality="", contactPerson="")
-                    identifier = ""
-                    if parcel_id:
-                        parcel = parcel_id.split(":")[3] if op.operatedOn else None
-                        if parcel:
-                            parcel_data, farm, identifier = get_parcel_info(
-                                parcel_id.split(":")[-1],
-                                token,
-                                geolocator,
-                                identifier_flag=True,
-                            )
-                            address = parcel_data.address
-
-                    row.cell(address)
-                    row.cell(identifier)
-                    farm_local = (
-                        f"Name: {farm.name} | Municipality: {farm.municipality}"
-                    )
-                    row.cell(farm_local)
+                    for text in parcel_cells.get(
+                        _get_operated_parcel_id(op), no_parcel_cells
+                    ):
+                        row.cell(text)
 
                 row.cell(
                     f"{op.hasAppliedAmount.numericValue}",
@@ -311,10 +317,7 @@ def create_pdf_from_operations(
                     row.cell("Yes" if op.usesFertilizer else "No")
                     row.cell(op.hasApplicationMethod)
                 else:
-                    pest = ""
-                    if op.usesPesticide:
-                        pest = get_pest_from_obj(op, token)
-                    row.cell(pest)
+                    row.cell(pest_names.get(get_pest_id(op), ""))
 
 
     if operations and parcel_defined:
@@ -325,10 +328,11 @@ def create_pdf_from_operations(
                 if float(parcel_data.area) > 0
                 else 0
             )
-            df_for_calc = prepare_df_for_calculations(operations)
-            total_volume_graph = generate_total_volume_graph(df_for_calc, area_parcel)
+            irrigation_data = prepare_df_for_calculations(operations)
+            total_volume_graph, amount_per_hc_graph = generate_irrigation_graphs(
+                irrigation_data, area_parcel
+            )
             pdf.ln(1)
-            amount_per_hc_graph = generate_amount_per_hectare(df_for_calc)
             pdf.add_page()
             pdf.set_font("FreeSerif", "B", 15)
             pdf.set_x((pdf.w / 4) - 30)
@@ -337,12 +341,12 @@ def create_pdf_from_operations(
             pdf.set_font("FreeSerif", "", 10)
             pdf.cell(10, 2, "Graph 1: ", ln=2, align='L')
             pdf.ln(2)
-            pdf.image(total_volume_graph, type="png", w=180)
+            pdf.image(total_volume_graph, w=180)
             pdf.cell(10, 2, "Graph 2: ", ln=1, align='L')
             pdf.ln(2)
-            pdf.image(amount_per_hc_graph, type="png", w=180)
+            pdf.image(amount_per_hc_graph, w=180)
 
-            dict_average_table = generate_aggregation_table_data(df_for_calc)
+            dict_average_table = generate_aggregation_table_data(irrigation_data, area_parcel)
             pdf.set_fill_color(0, 255, 255)
             pdf.set_font("FreeSerif", "B", 15)
             pdf.add_page()
@@ -365,7 +369,7 @@ def create_pdf_from_operations(
                     row.cell(f"{v[1]:.2f}")
 
         elif isinstance(operations[0], CropProtectionOperation):
-            pesticide_sums = pesticides_aggregation(operations, token)
+            pesticide_sums = pesticides_aggregation(operations, token, pest_names)
             pdf.set_fill_color(0, 255, 255)
             pdf.set_font("FreeSerif", "B", 15)
             pdf.add_page()
@@ -379,16 +383,16 @@ def create_pdf_from_operations(
                 row.cell("Total")
                 pdf.set_font("FreeSerif", "", 9)
                 pdf.set_fill_color(255, 255, 240)
-                for _, row_df in pesticide_sums.iterrows():
+                for total in pesticide_sums:
                     row = table.row()
-                    row.cell(row_df["Pesticide"])
-                    row.cell(f"{row_df['Dose']:.2f} {row_df['Unit']}")
+                    row.cell(total.pesticide)
+                    row.cell(f"{total.dose:.2f} {total.unit}")
 
     return pdf
 
 
 def process_irrigation_fertilization_data(
-    data,
+    data_path: str | None,
     token: dict[str, str],
     pdf_file_name: str,
     from_date: datetime.date = None,
@@ -398,13 +402,23 @@ def process_irrigation_fertilization_data(
     irrigation_flag: bool = True,
     fertilization_flag: bool = False,
     pesticides_flag: bool = False,
-) -> None:
+) -> bytes | None:
     """
     Process irrigation data and generate PDF report
     """
+    data = read_spooled_upload(data_path)
     data_used = False
     url_use = "irrigations"
 
+    # Parcel details and satellite image do not depend on the operations, fetch them meanwhile
+    prefetch_executor = ThreadPoolExecutor(max_workers=1)
+    parcel_prefetch = (
+        prefetch_executor.submit(_prefetch_parcel, parcel_id, token)
+        if parcel_id
+        else None
+    )
+    prefetch_executor.shutdown(wait=False)
+
     if fertilization_flag:
         url_use = "fertilization"
     elif pesticides_flag:
@@ -412,7 +426,7 @@ def process_irrigation_fertilization_data(
 
     if operation_id:
         json_data = make_get_request(
-            url=f"{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS[url_use]}{operation_id}/",
+            url=f"{FARMCALENDAR_URLS[url_use]}{operation_id}/",
             token=token,
             params={"format": "json"},
         )
@@ -424,17 +438,19 @@ def process_irrigation_fertilization_data(
             params = {"format": "json"}
             if parcel_id:
                 params["parcel"] = parcel_id
+            if settings.REPORTING_FARMCALENDAR_ORDERING:
+                params["ordering"] = settings.REPORTING_FARMCALENDAR_ORDERING
 
             decode_dates_filters(params, from_date, to_date)
             json_data = make_get_request(
-                url=f"{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS[url_use]}",
+                url=FARMCALENDAR_URLS[url_use],
                 token=token,
                 params=params,
             )
 
         else:
             data_used = True
-            json_data = json.loads(data)
+            json_data = orjson.loads(data)
             if json_data:
                 json_data = json_data["@graph"]
 
@@ -447,6 +463,9 @@ def process_irrigation_fertilization_data(
     else:
         operations = []
 
+    if parcel_prefetch:
+        parcel_prefetch.result()
+
     try:
         pdf = create_pdf_from_operations(
             operations,
@@ -462,6 +481,4 @@ def process_irrigation_fertilization_data(
         raise HTTPException(
             status_code=400, detail="PDF generation of irrigation report failed."
         )
-    pdf_dir = f"{settings.PDF_DIRECTORY}{pdf_file_name}"
-    os.makedirs(os.path.dirname(f"{pdf_dir}.pdf"), exist_ok=True)
-    pdf.output(f"{pdf_dir}.pdf")
+    return write_pdf(pdf, pdf_file_name)
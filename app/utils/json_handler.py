@@ -1,12 +1,135 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from fastapi import HTTPException
 
 from core import settings
+from utils.jwt_cache import token_cache_key
+import httpx
+import orjson
 import requests
-from typing import Dict, Optional, Union
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, List, Mapping, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+ASYNC_MAX_CONNECTIONS = 32
+ASYNC_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+# (connect, read) timeout of synchronous requests
+REQUEST_TIMEOUT = (5, 30)
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 4.0
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+SESSION_POOL_SIZE = 32
+ETAG_CACHE_MAX_SIZE = 1024
+ETAG_CACHE_TTL = 3600
+
+# Keep-alive connections to the gatekeeper are reused by every request of the process.
+# The adapter's connection pools are thread-safe, Session state (cookies) is not, so
+# every thread gets its own Session on top of the shared adapter.
+# Retries are done by make_get_request, so the adapter does not retry on its own.
+_adapter = HTTPAdapter(pool_connections=SESSION_POOL_SIZE, pool_maxsize=SESSION_POOL_SIZE)
+_thread_sessions = threading.local()
+
+# Last body per (url, params, token) of responses that came with an ETag, sent back as
+# If-None-Match. Bodies are kept as received and parsed on every hit, so callers never
+# share parsed objects. Responses without an ETag are not cached.
+_etag_cache = TTLCache(maxsize=ETAG_CACHE_MAX_SIZE, ttl=ETAG_CACHE_TTL)
+_etag_lock = threading.Lock()
+
+# Event loop and async client shared by make_get_requests calls, see shared_async_client
+_shared_async_client: ContextVar[
+    tuple[asyncio.Runner, httpx.AsyncClient] | None
+] = ContextVar("shared_async_client", default=None)
+
+
+def get_session() -> requests.Session:
+    """
+    Keep-alive session of the current thread, for synchronous requests of the service
+    """
+    session = getattr(_thread_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.mount("http://", _adapter)
+        session.mount("https://", _adapter)
+        _thread_sessions.session = session
+    return session
+
+
+def close_session() -> None:
+    """
+    Close keep-alive connections of synchronous requests, on application shutdown
+    """
+    _adapter.close()
+
+
+def _retry_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given (zero based) attempt
+    """
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2**attempt))
+
+
+def _get_headers(token: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    # Built per request, raw tokens are not kept past the request (see utils.jwt_cache)
+    if not token:
+        return None
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token}",
+    }
+
+
+def _etag_key(url: str, params: Optional[dict], token) -> tuple[str, bytes, str]:
+    # Responses depend on the user, so the token is part of the key
+    return (
+        url,
+        orjson.dumps(params or {}, option=orjson.OPT_SORT_KEYS),
+        token_cache_key(str(token)),
+    )
+
+
+def _conditional_request(
+    headers: Optional[Mapping[str, str]], key: tuple
+) -> tuple[Optional[Mapping[str, str]], tuple[str, bytes] | None]:
+    """
+    Headers of the request, with If-None-Match if a body of the same request is cached
+
+    :return: (headers, (etag, body) of the cached response or None)
+    """
+    with _etag_lock:
+        cached = _etag_cache.get(key)
+    if cached is None:
+        return headers, None
+    return {**(headers or {}), "If-None-Match": cached[0]}, cached
+
+
+def _parse_response(
+    response: requests.Response | httpx.Response,
+    key: tuple,
+    cached: tuple[str, bytes] | None,
+) -> Union[dict, str]:
+    """
+    JSON body of the response, or of the cached response if the server answered 304 Not Modified
+    """
+    if response.status_code == 304 and cached is not None:
+        return orjson.loads(cached[1])
+
+    response.raise_for_status()
+
+    etag = response.headers.get("ETag")
+    if etag:
+        with _etag_lock:
+            _etag_cache[key] = (etag, response.content)
+    return orjson.loads(response.content)
+
 
 def make_get_request(
     url: str,
@@ -29,31 +152,137 @@ def make_get_request(
     """
 
     base_url = f"{settings.REPORTING_GATEKEEPER_BASE_URL}{url}"
-    headers = None
-    if token:
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": "Bearer {}".format(token),
-        }
-
-    try:
-        response = (
-            requests.get(
+    key = _etag_key(base_url, params, token)
+    headers, cached = _conditional_request(_get_headers(token), key)
+
+    # Transient failures (timeouts, dropped connections, 5xx from a busy upstream)
+    # are retried a few times, everything else fails right away
+    for attempt in range(RETRY_ATTEMPTS):
+        last_attempt = attempt == RETRY_ATTEMPTS - 1
+        try:
+            response = get_session().get(
                 base_url,
                 params=params,
                 headers=headers,
+                timeout=REQUEST_TIMEOUT,
             )
-            if headers
-            else requests.get(
-                base_url,
-                params=params,
-            )
+            if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                logger.info(
+                    f"Gatekeeper API returned {response.status_code}, retrying."
+                )
+                time.sleep(_retry_delay(attempt))
+                continue
+
+            return _parse_response(response, key, cached)
+
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last_attempt:
+                logger.info(f"Gatekeeper API returned an error. {e}")
+                return None
+            time.sleep(_retry_delay(attempt))
+
+        except Exception as e:
+            logger.info(f"Gatekeeper API returned an error. {e}")
+            return None
+
+
+async def make_get_request_async(
+    client: httpx.AsyncClient,
+    url: str,
+    params: Optional[Dict[str, Union[str, int, float]]] = None,
+    token: Optional[Dict[str, str]] = None,
+) -> Union[dict, str] | None:
+    """
+    Async version of make_get_request, sent through the given client.
+
+    Returns:
+        JSON response from the request, None if request failed
+    """
+    base_url = f"{settings.REPORTING_GATEKEEPER_BASE_URL}{url}"
+    key = _etag_key(base_url, params, token)
+    headers, cached = _conditional_request(_get_headers(token), key)
+
+    # Same retry policy as make_get_request, without blocking the event loop
+    for attempt in range(RETRY_ATTEMPTS):
+        last_attempt = attempt == RETRY_ATTEMPTS - 1
+        try:
+            response = await client.get(base_url, params=params, headers=headers)
+            if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                logger.info(
+                    f"Gatekeeper API returned {response.status_code}, retrying."
+                )
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+
+            return _parse_response(response, key, cached)
+
+        except httpx.TransportError as e:
+            if last_attempt:
+                logger.info(f"Gatekeeper API returned an error. {e}")
+                return None
+            await asyncio.sleep(_retry_delay(attempt))
+
+        except Exception as e:
+            logger.info(f"Gatekeeper API returned an error. {e}")
+            return None
+
+
+def _new_async_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS),
+        timeout=ASYNC_TIMEOUT,
+    )
+
+
+@contextmanager
+def shared_async_client():
+    """
+    Reuse one event loop and async client, with its keep-alive connections,
+    for every make_get_requests call of the current thread inside this context.
+    Meant to wrap the generation of a whole report.
+    """
+    if _shared_async_client.get() is not None:
+        yield
+        return
+    with asyncio.Runner() as runner:
+        client = _new_async_client()
+        context_token = _shared_async_client.set((runner, client))
+        try:
+            yield
+        finally:
+            _shared_async_client.reset(context_token)
+            runner.run(client.aclose())
+
+
+def make_get_requests(
+    urls: Iterable[str],
+    params: Optional[Dict[str, Union[str, int, float]]] = None,
+    token: Optional[Dict[str, str]] = None,
+) -> List[Union[dict, str] | None]:
+    """
+    Makes GET requests concurrently with the same parameters and headers.
+    Runs its own event loop (or the one of shared_async_client), so it is meant
+    for synchronous report generation code.
+
+    Returns:
+        JSON responses in order of urls, None for every failed request
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+
+    async def gather(client: httpx.AsyncClient):
+        return await asyncio.gather(
+            *(make_get_request_async(client, url, params, token) for url in urls)
         )
 
-        response.raise_for_status()
+    shared = _shared_async_client.get()
+    if shared is not None:
+        runner, client = shared
+        return runner.run(gather(client))
 
-        return response.json()
+    async def gather_with_new_client():
+        async with _new_async_client() as client:
+            return await gather(client)
 
-    except Exception as e:
-        logger.info(f"Gatekeeper API returned an error. {e}")
-        return None
+    return asyncio.run(gather_with_new_client())
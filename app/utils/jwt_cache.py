@@ -0,0 +1,47 @@
+import copy
+import hashlib
+import threading
+import time
+
+from cachetools import TLRUCache
+
+JWT_CACHE_MAX_SIZE = 10_000
+JWT_CACHE_TTL = 30
+
+
+def _time_to_use(_key: str, payload: dict, now: float) -> float:
+    """
+    Entries live for JWT_CACHE_TTL seconds, but never past the token expiration
+    """
+    ttl = JWT_CACHE_TTL
+    exp = payload.get("exp") if isinstance(payload, dict) else None
+    if isinstance(exp, (int, float)):
+        ttl = min(ttl, exp - time.time())
+    return now + ttl
+
+
+_cache = TLRUCache(maxsize=JWT_CACHE_MAX_SIZE, ttu=_time_to_use)
+_lock = threading.Lock()
+
+
+def token_cache_key(token: str) -> str:
+    """
+    Key used for caching token related data, raw tokens are never stored
+    """
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def get_cached_payload(token: str) -> dict | None:
+    with _lock:
+        payload = _cache.get(token_cache_key(token))
+    if payload is None:
+        return None
+    # Callers get their own copy, their changes do not reach later requests with the token
+    return copy.deepcopy(payload)
+
+
+def cache_payload(token: str, payload: dict) -> None:
+    # Later changes of the caller's payload do not reach the cache
+    payload = copy.deepcopy(payload)
+    with _lock:
+        _cache[token_cache_key(token)] = payload
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+import time
+
+from cachetools import TTLCache
+
+from core import settings
+
+PDF_MEMORY_CACHE_MAX_SIZE = 200
+PDF_MEMORY_CACHE_TTL = 300
+# Larger reports are not returned by write_pdf and are only served from disk
+PDF_MEMORY_CACHE_MAX_BYTES = 1 << 20
+# Oldest reports are removed from PDF_CACHE_DIRECTORY above this size
+PDF_DISK_CACHE_MAX_BYTES = 200 << 20
+
+_cache = TTLCache(maxsize=PDF_MEMORY_CACHE_MAX_SIZE, ttl=PDF_MEMORY_CACHE_TTL)
+_lock = threading.Lock()
+
+
+def remember_pdf(pdf_file_name: str, content: bytes) -> None:
+    """
+    Keep a freshly generated report in memory until it is retrieved
+
+    :param pdf_file_name: Name of the report (user_id/report_id) without extension
+    :param content: PDF content
+    """
+    with _lock:
+        _cache[pdf_file_name] = content
+
+
+def pop_pdf(pdf_file_name: str) -> bytes | None:
+    """
+    Take a report out of memory, later retrievals are served from disk
+
+    :param pdf_file_name: Name of the report (user_id/report_id) without extension
+
+    :return: PDF content, or None if it is not in memory
+    """
+    with _lock:
+        return _cache.pop(pdf_file_name, None)
+
+
+def report_cache_key(*filters) -> str:
+    """
+    Key of a rendered report, built from everything the report content depends on
+
+    :param filters: Report type, user and request filters
+
+    :return: Hex digest used as file name in the PDF cache directory
+    """
+    return hashlib.blake2b(
+        "|".join(map(str, filters)).encode(), digest_size=16
+    ).hexdigest()
+
+
+def cached_report_path(key: str) -> str:
+    return f"{settings.PDF_CACHE_DIRECTORY}{key}.pdf"
+
+
+def load_cached_report(key: str) -> bytes | None:
+    """
+    Read a report rendered with the same filters, if it is not older than REPORTING_PDF_CACHE_TTL.
+    Expired reports are removed.
+
+    :param key: Key from report_cache_key
+
+    :return: PDF content, or None if there is no fresh report
+    """
+    path = cached_report_path(key)
+    try:
+        # Modification time is the render time, reads must not refresh it
+        if time.time() - os.stat(path).st_mtime > settings.REPORTING_PDF_CACHE_TTL:
+            try:
+                os.remove(path)
+            except OSError:
+                # Already removed by another worker process
+                pass
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from core import settings
+from utils.json_handler import shared_async_client
+from utils.pdf_cache import remember_pdf
+
+logger = logging.getLogger(__name__)
+
+_executor: ProcessPoolExecutor | None = None
+
+
+class ReportGenerationError(Exception):
+    """
+    Picklable error raised back from report worker processes
+    """
+
+
+def start_report_executor() -> None:
+    """
+    Start worker processes used for PDF generation
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORTING_PDF_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+def shutdown_report_executor() -> None:
+    """
+    Wait for running reports and stop worker processes
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _run_report(func: Callable[..., bytes | None], kwargs: dict) -> bytes | None:
+    # HTTPException can not be unpickled, which would break the whole pool
+    try:
+        # Concurrent gatekeeper requests of the whole report share one client
+        with shared_async_client():
+            return func(**kwargs)
+    except Exception as e:
+        logger.error(f"Report generation failed. {e}")
+        raise ReportGenerationError(str(e)) from None
+
+
+async def run_report_task(func: Callable[..., bytes | None], /, **kwargs) -> None:
+    """
+    Run report generation function in a worker process, without blocking the event loop.
+    If worker processes are not started, default threadpool is used.
+    Small reports returned by the function are kept in memory for the first retrieval.
+
+    :param func: Module level report function (process_*_data)
+    :param kwargs: Arguments of the report function, must be picklable
+    """
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(
+        _executor, functools.partial(_run_report, func, kwargs)
+    )
+    if isinstance(content, (bytes, bytearray)):
+        remember_pdf(kwargs["pdf_file_name"], bytes(content))
@@ -1,12 +1,44 @@
+import hashlib
 import io
+import logging
+import os
+import threading
+
 import requests
+from cachetools import LRUCache
 from fastapi import HTTPException
+from PIL import Image
+
+from core import settings
+from utils.json_handler import get_session
+from utils.utils import trim_directory, write_file
+
+logger = logging.getLogger(__name__)
+
 # --- Service Definition ---
 # EOX Sentinel-2 Cloudless (Global, Commercial Use OK, CC BY 4.0)
 # This uses the 2016 layer, which is licensed for commercial use.
 EOX_WMS_URL = "https://tiles.maps.eox.at/wms"
 EOX_LAYER = "s2cloudless"
 
+# Reports embed the image 100mm wide, about 600px at 150 dpi
+SATELLITE_IMAGE_MAX_PX = 600
+# Size requested for reports, same 4:3 ratio as the fetch_wms_image defaults
+SATELLITE_IMAGE_WIDTH = SATELLITE_IMAGE_MAX_PX
+SATELLITE_IMAGE_HEIGHT = SATELLITE_IMAGE_MAX_PX * 3 // 4
+SATELLITE_IMAGE_JPEG_QUALITY = 82
+
+# Compressed images are a few tens of kB each, older ones are still read back from disk
+WMS_CACHE_MAX_SIZE = 128
+# About a metre, finer differences of a parcel location give the same image
+WMS_COORDINATE_DECIMALS = 5
+
+# Least recently used images are removed from WMS_CACHE_DIRECTORY above this size
+WMS_DISK_CACHE_MAX_BYTES = 200 << 20
+
+_wms_cache = LRUCache(maxsize=WMS_CACHE_MAX_SIZE)
+_wms_lock = threading.Lock()
+
 
 class SatelliteImageException(Exception):
     pass
@@ -18,19 +50,25 @@ def fetch_wms_image(
         layer_name: str = EOX_LAYER,
         size_degrees: float = 1.8,
         width: int = 1600,
-        height: int = 1200
+        height: int = 1200,
+        session: requests.Session | None = None,
+        image_format: str = "image/png",
 ):
     """
     Fetches an image from a standard WMS service.
+    Requests go through the session of the current thread (see get_session) unless one is given.
+    Transparency is only requested for PNG images.
+    size_degrees is in hundredths of a degree: the default 1.8 gives a box 0.018 degrees
+    (about 2km) wide around the parcel.
     """
 
     half_size = size_degrees / 200.0
-    min_lat = lat - half_size
-    max_lat = lat + half_size
-    min_lon = lon - half_size
-    max_lon = lon + half_size
 
-    bbox_1_3_0 = f"{min_lat},{min_lon},{max_lat},{max_lon}"
+    # WMS 1.3.0 with EPSG:4326 uses latitude, longitude axis order
+    bbox_1_3_0 = (
+        f"{lat - half_size:.6f},{lon - half_size:.6f},"
+        f"{lat + half_size:.6f},{lon + half_size:.6f}"
+    )
     crs_1_3_0 = "EPSG:4326"
 
     #Define the WMS parameters
@@ -40,16 +78,17 @@ def fetch_wms_image(
         'VERSION': '1.3.0',
         'LAYERS': layer_name,
         'STYLES': '',
-        'FORMAT': 'image/png',
-        'TRANSPARENT': 'true',
+        'FORMAT': image_format,
         'CRS': crs_1_3_0,
         'BBOX': bbox_1_3_0,
         'WIDTH': width,
         'HEIGHT': height
     }
+    if image_format == "image/png":
+        wms_params['TRANSPARENT'] = 'true'
 
     try:
-        response = requests.get(wms_url, params=wms_params, timeout=20)
+        response = (session or get_session()).get(wms_url, params=wms_params, timeout=20)
         response.raise_for_status()
 
         if 'image' not in response.headers.get('Content-Type', ''):
@@ -61,4 +100,79 @@ def fetch_wms_image(
         return response.content
 
     except requests.exceptions.RequestException as e:
-        raise SatelliteImageException(f"Error fetching image from WMS: {e}")
\ No newline at end of file
+        raise SatelliteImageException(f"Error fetching image from WMS: {e}")
+
+
+def compress_satellite_image(image: bytes, max_px: int = SATELLITE_IMAGE_MAX_PX) -> bytes:
+    """
+    Downscale WMS image to the size it is embedded with and re-encode it as JPEG.
+    Transparent areas are flattened on white, as they are shown in the PDF.
+    JPEG images that already fit are returned unchanged.
+    """
+    try:
+        with Image.open(io.BytesIO(image)) as im:
+            if im.format == "JPEG" and max(im.size) <= max_px:
+                return image
+            im.thumbnail((max_px, max_px), Image.LANCZOS)
+            im = im.convert("RGBA")
+            flat = Image.new("RGB", im.size, (255, 255, 255))
+            flat.paste(im, mask=im.getchannel("A"))
+    except OSError as e:
+        raise SatelliteImageException(f"WMS image could not be read: {e}")
+    buffer = io.BytesIO()
+    flat.save(buffer, "JPEG", quality=SATELLITE_IMAGE_JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def fetch_wms_image_cached(lat: float, lon: float) -> bytes:
+    """
+    fetch_wms_image of the default layer as a SATELLITE_IMAGE_WIDTH x SATELLITE_IMAGE_HEIGHT JPEG,
+    compressed for embedding in a report
+    (see compress_satellite_image) and cached in memory and in WMS_CACHE_DIRECTORY.
+    Coordinates are rounded to WMS_COORDINATE_DECIMALS, errors are raised and are not cached.
+    """
+    lat = round(lat, WMS_COORDINATE_DECIMALS)
+    lon = round(lon, WMS_COORDINATE_DECIMALS)
+    key = (lat, lon)
+    with _wms_lock:
+        image = _wms_cache.get(key)
+    if image is not None:
+        return image
+
+    name = hashlib.blake2b(f"{EOX_LAYER}|{lat}|{lon}".encode(), digest_size=16).hexdigest()
+    path = f"{settings.WMS_CACHE_DIRECTORY}{name}.jpg"
+    try:
+        with open(path, "rb") as f:
+            image = f.read()
+    except FileNotFoundError:
+        image = compress_satellite_image(
+            fetch_wms_image(
+                lat,
+                lon,
+                width=SATELLITE_IMAGE_WIDTH,
+                height=SATELLITE_IMAGE_HEIGHT,
+                image_format="image/jpeg",
+            )
+        )
+        try:
+            write_file(path, image)
+            trim_wms_disk_cache()
+        except OSError as e:
+            logger.info(f"Satellite image could not be cached on disk. {e}")
+    else:
+        # Modification time orders images for trim_wms_disk_cache
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    with _wms_lock:
+        _wms_cache[key] = image
+    return image
+
+
+def trim_wms_disk_cache(max_bytes: int = WMS_DISK_CACHE_MAX_BYTES) -> None:
+    """
+    Remove least recently used images from WMS_CACHE_DIRECTORY until it holds at most max_bytes
+    """
+    trim_directory(settings.WMS_CACHE_DIRECTORY, ".jpg", max_bytes)
@@ -0,0 +1,47 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_SIZE = 1 << 20
+
+
+def spool_upload(upload: UploadFile) -> str:
+    """
+    Copy uploaded file to a named temporary file in chunks.
+    Blocking, run it in threadpool from async code.
+
+    :param upload: Uploaded file
+
+    :return: Path of the temporary file
+    """
+    upload.file.seek(0)
+    with tempfile.NamedTemporaryFile(
+        prefix="report_upload_", suffix=".json", delete=False
+    ) as tmp:
+        shutil.copyfileobj(upload.file, tmp, length=SPOOL_CHUNK_SIZE)
+    return tmp.name
+
+
+def read_spooled_upload(data_path: str | None) -> bytes | None:
+    """
+    Read the content of a spooled upload and remove the temporary file
+
+    :param data_path: Path returned by spool_upload
+
+    :return: File content, or None if no file was uploaded
+    """
+    if not data_path:
+        return None
+    try:
+        with open(data_path, "rb") as f:
+            return f.read()
+    finally:
+        try:
+            os.remove(data_path)
+        except OSError as e:
+            logger.info(f"Spooled upload {data_path} could not be removed. {e}")
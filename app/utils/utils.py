@@ -1,35 +1,110 @@
 import datetime
+import fcntl
+import functools
+import hashlib
+import io
 import logging
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Mapping
 
 import jwt
+import requests
+from cachetools import LRUCache, TTLCache
 from fpdf import FPDF
 from pydantic import BaseModel
 
-from core import settings
-from utils.json_handler import make_get_request
+from core import settings, FARMCALENDAR_URLS
+from utils.json_handler import make_get_request, make_get_requests
+from utils.pdf_cache import (
+    PDF_DISK_CACHE_MAX_BYTES,
+    PDF_MEMORY_CACHE_MAX_BYTES,
+    cached_report_path,
+)
+from utils.jwt_cache import get_cached_payload, cache_payload, token_cache_key
+from geopy.adapters import RequestsAdapter
+from geopy.exc import GeocoderServiceError
 from geopy.geocoders import Nominatim
 
 logger = logging.Logger("utils")
 
 
+FONTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+# (family, style, font file) registered on every report
+REPORT_FONTS = (
+    ("FreeSerif", "", os.path.join(FONTS_DIRECTORY, "FreeSerif.ttf")),
+    ("FreeSerif", "B", os.path.join(FONTS_DIRECTORY, "FreeSerifBold.ttf")),
+)
+
+
 def add_fonts(pdf):
-    fonts_folder_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "fonts"
-    )
+    # Parsed fonts are not shared between documents, fpdf subsets them in place on output
+    for family, style, font_path in REPORT_FONTS:
+        pdf.add_font(family, style, font_path)
 
-    pdf.add_font(
-        "FreeSerif", "", os.path.join(fonts_folder_path, "FreeSerif.ttf"), uni=True
-    )
-    pdf.add_font(
-        "FreeSerif", "B", os.path.join(fonts_folder_path, "FreeSerifBold.ttf"), uni=True
-    )
+
+LOGO_URL = "https://horizon-openagri.eu/wp-content/uploads/2023/12/Logo-Open-Agri-blue-1024x338.png"
+LOGO_TIMEOUT = (5, 30)
+# After a failed download the logo is only downloaded again once this time passed
+LOGO_RETRY_SECONDS = 300
+
+_logo: bytes | None = None
+_logo_failed_at: float | None = None
+_logo_lock = threading.Lock()
+
+
+def _get_logo() -> bytes | None:
+    """
+    Logo of the report header, downloaded once and kept in memory and in PDF_CACHE_DIRECTORY.
+    A failed download is not repeated for LOGO_RETRY_SECONDS.
+
+    :return: PNG content, or None if it is not available
+    """
+    global _logo, _logo_failed_at
+    with _logo_lock:
+        if _logo is not None:
+            return _logo
+        if (
+            _logo_failed_at is not None
+            and time.monotonic() - _logo_failed_at < LOGO_RETRY_SECONDS
+        ):
+            return None
+
+    # Not under the lock, a slow logo host must not block headers of other reports
+    path = f"{settings.PDF_CACHE_DIRECTORY}openagri_logo.png"
+    try:
+        with open(path, "rb") as f:
+            logo = f.read()
+    except FileNotFoundError:
+        try:
+            response = requests.get(LOGO_URL, timeout=LOGO_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Logo could not be downloaded. {e}")
+            with _logo_lock:
+                _logo_failed_at = time.monotonic()
+            return None
+        logo = response.content
+        try:
+            write_file(path, logo)
+        except OSError as e:
+            logger.info(f"Logo could not be cached on disk. {e}")
+
+    with _logo_lock:
+        _logo = logo
+    return logo
 
 
 class EX(FPDF):
     def header(self):
+        # Same content is embedded once per document by fpdf. Without a logo fpdf
+        # loads it from LOGO_URL itself, also once per document
+        logo = _get_logo()
         self.image(
-            "https://horizon-openagri.eu/wp-content/uploads/2023/12/Logo-Open-Agri-blue-1024x338.png",
+            io.BytesIO(logo) if logo else LOGO_URL,
             w=40.0,
             keep_aspect_ratio=True,
             x=160,
@@ -48,6 +123,122 @@ class EX(FPDF):
         self.multi_cell(200, 2, acknowledgement_text, border=0, align="J")
 
 
+# mkstemp creates files readable by their owner only, written files get the
+# permissions open() would give them instead
+_umask = os.umask(0)
+os.umask(_umask)
+_FILE_MODE = 0o666 & ~_umask
+
+_ensured_dirs: set[str] = set()
+_ensured_dirs_lock = threading.Lock()
+
+
+def _ensure_dir(path: str) -> None:
+    """
+    Create report directory once per process
+    """
+    with _ensured_dirs_lock:
+        if path in _ensured_dirs:
+            return
+    os.makedirs(path, exist_ok=True)
+    with _ensured_dirs_lock:
+        _ensured_dirs.add(path)
+
+
+def write_file(path: str, content: bytes | bytearray) -> None:
+    """
+    Write file next to its final path and move it there only when it is completely written.
+    Every writer gets its own temporary file, so concurrent writes of the same path do not
+    interfere, the last one moved there wins.
+    """
+    file_dir = os.path.dirname(path)
+    _ensure_dir(file_dir)
+    try:
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=file_dir)
+    except FileNotFoundError:
+        # Directory was removed after it was first created
+        with _ensured_dirs_lock:
+            _ensured_dirs.discard(file_dir)
+        _ensure_dir(file_dir)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=file_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.chmod(tmp_path, _FILE_MODE)
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def trim_directory(directory: str, suffix: str, max_bytes: int) -> None:
+    """
+    Remove the oldest (by modification time) files ending with suffix from directory
+    until they take at most max_bytes. Other files and subdirectories are left alone.
+    """
+    with os.scandir(directory) as entries:
+        files = [
+            (e.stat(), e.path)
+            for e in entries
+            if e.name.endswith(suffix) and e.is_file()
+        ]
+    total = sum(stat.st_size for stat, _ in files)
+    if total <= max_bytes:
+        return
+    for stat, path in sorted(files, key=lambda file: file[0].st_mtime):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Removed by another worker process
+            pass
+        total -= stat.st_size
+        if total <= max_bytes:
+            break
+
+
+def write_pdf_content(
+    content: bytes | bytearray, pdf_file_name: str, cache_key: str | None = None
+) -> bytes | None:
+    """
+    Write rendered PDF report to the PDF directory, so a report is never retrieved half written
+
+    :param content: PDF content
+    :param pdf_file_name: Name of the report (user_id/report_id) without extension
+    :param cache_key: If given, report is also stored for later requests with the same filters
+
+    :return: PDF content if it is small enough to be served from memory, otherwise None
+    """
+    write_file(f"{settings.PDF_DIRECTORY}{pdf_file_name}.pdf", content)
+    if cache_key:
+        # The report itself is written, a failed cache copy only costs a later re-render
+        try:
+            write_file(cached_report_path(cache_key), content)
+            trim_directory(settings.PDF_CACHE_DIRECTORY, ".pdf", PDF_DISK_CACHE_MAX_BYTES)
+        except OSError as e:
+            logger.info(f"Report could not be cached on disk. {e}")
+    if len(content) <= PDF_MEMORY_CACHE_MAX_BYTES:
+        return bytes(content)
+    return None
+
+
+def write_pdf(pdf: FPDF, pdf_file_name: str, cache_key: str | None = None) -> bytes | None:
+    """
+    Write generated PDF report to the PDF directory
+
+    :param pdf: Generated PDF
+    :param pdf_file_name: Name of the report (user_id/report_id) without extension
+    :param cache_key: If given, report is also stored for later requests with the same filters
+
+    :return: PDF content if it is small enough to be served from memory, otherwise None
+    """
+    # fpdf2 renders to a single bytearray buffer, output(file) would only write
+    # that same buffer, so it is kept to also return it for the memory cache
+    return write_pdf_content(pdf.output(), pdf_file_name, cache_key)
+
+
 def decode_jwt_token(token: str) -> dict:
     """
     Decode JWT token
@@ -56,7 +247,12 @@ def decode_jwt_token(token: str) -> dict:
 
     :return: Dictionary with decoded information
     """
+    decoded = get_cached_payload(token)
+    if decoded is not None:
+        return decoded
+
     decoded = jwt.decode(token, options={"verify_signature": False})
+    cache_payload(token, decoded)
     return decoded
 
 
@@ -91,9 +287,184 @@ class ParcelInfo(BaseModel):
     long: float | None = 0
 
 
-def get_parcel_info(
-    parcel_id: str, token: dict, geolocator: Nominatim, identifier_flag: bool = False
-):
+PARCEL_INFO_CACHE_MAX_SIZE = 4096
+PARCEL_INFO_CACHE_TTL = 300
+
+# Process wide, so repeated reports for the same farm skip the farm calendar
+# and geocoder round-trips. Starts empty with every process.
+_parcel_info_cache = TTLCache(
+    maxsize=PARCEL_INFO_CACHE_MAX_SIZE, ttl=PARCEL_INFO_CACHE_TTL
+)
+_parcel_info_lock = threading.Lock()
+# Farm calendar entries of farms, per (farm_id, token). Parcels of a farm share them.
+_farm_cache = TTLCache(maxsize=PARCEL_INFO_CACHE_MAX_SIZE, ttl=PARCEL_INFO_CACHE_TTL)
+
+
+GEOCODE_CACHE_MAX_SIZE = 4096
+# Addresses rarely change, cached ones are looked up again after a month
+GEOCODE_DISK_CACHE_TTL = 30 * 24 * 60 * 60
+# About a metre, points of the same parcel share the address
+GEOCODE_COORDINATE_DECIMALS = 5
+
+# Coordinates of a parcel do not change, neither does their address
+_geocode_cache = LRUCache(maxsize=GEOCODE_CACHE_MAX_SIZE)
+_geocode_lock = threading.Lock()
+
+# Nominatim usage policy allows at most one request per second. Every worker process
+# of the service waits for its turn, see _wait_for_geocode_slot. Timeouts and service
+# errors are retried after a pause, the last error is raised
+GEOCODE_MIN_DELAY_SECONDS = 1.0
+# Timeout of every attempt, retries of a slow Nominatim get more time
+GEOCODE_TIMEOUTS = (10, 15, 15)
+GEOCODE_ERROR_WAIT_SECONDS = 5.0
+# Requests are spaced by _wait_for_geocode_slot, a couple of keep-alive connections are enough
+GEOCODE_POOL_SIZE = 2
+
+# Geolocator of every report of the process. Its requests session, and so the TLS
+# connection to Nominatim, is reused by all lookups. It keeps no per-request state,
+# so report threads share it.
+GEOLOCATOR = Nominatim(
+    user_agent="reporting_open_agri_app",
+    timeout=GEOCODE_TIMEOUTS[0],
+    adapter_factory=functools.partial(
+        RequestsAdapter, pool_connections=1, pool_maxsize=GEOCODE_POOL_SIZE
+    ),
+)
+
+
+def _wait_for_geocode_slot() -> None:
+    """
+    Wait until GEOCODE_MIN_DELAY_SECONDS passed since the last geocoder request of any
+    process of the service. Time of the last request is kept in GEOCODE_CACHE_DIRECTORY,
+    its file lock makes requests of all processes and threads take turns.
+    """
+    _ensure_dir(settings.GEOCODE_CACHE_DIRECTORY)
+    with open(f"{settings.GEOCODE_CACHE_DIRECTORY}last_request", "a+b") as f:
+        # Released when the file is closed
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        try:
+            last_request = float(f.read() or 0)
+        except ValueError:
+            last_request = 0.0
+        # Bounded, so a clock set back does not stall geocoding
+        wait = min(
+            last_request + GEOCODE_MIN_DELAY_SECONDS - time.time(),
+            GEOCODE_MIN_DELAY_SECONDS,
+        )
+        if wait > 0:
+            time.sleep(wait)
+        f.seek(0)
+        f.truncate()
+        f.write(repr(time.time()).encode())
+
+
+def _rate_limited_reverse(geolocator: Nominatim, query: str):
+    """
+    Reverse geocode the query, one request at a time for the whole service.
+    Failed attempts are retried after GEOCODE_ERROR_WAIT_SECONDS with the next timeout
+    of GEOCODE_TIMEOUTS.
+    """
+    last_attempt = len(GEOCODE_TIMEOUTS) - 1
+    for attempt, timeout in enumerate(GEOCODE_TIMEOUTS):
+        _wait_for_geocode_slot()
+        try:
+            return geolocator.reverse(query, timeout=timeout)
+        except GeocoderServiceError as e:
+            # Timeouts, unavailable service and rate limiting
+            if attempt == last_attempt:
+                raise
+            logger.info(f"Geocoder returned an error, retrying. {e}")
+            time.sleep(GEOCODE_ERROR_WAIT_SECONDS)
+
+
+def _read_cached_address(path: str) -> str | None:
+    try:
+        if time.time() - os.stat(path).st_mtime > GEOCODE_DISK_CACHE_TTL:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def reverse_geocode(geolocator: Nominatim, lat: float, long: float) -> str:
+    """
+    Address of the coordinates, cached in memory and in GEOCODE_CACHE_DIRECTORY,
+    so worker processes share it. Coordinates are rounded to GEOCODE_COORDINATE_DECIMALS.
+    Errors of the geolocator are raised and are not cached.
+
+    :return: Formatted address (country, city and postcode)
+    """
+    lat = round(float(lat), GEOCODE_COORDINATE_DECIMALS)
+    long = round(float(long), GEOCODE_COORDINATE_DECIMALS)
+    key = (lat, long)
+    with _geocode_lock:
+        address = _geocode_cache.get(key)
+    if address is not None:
+        return address
+
+    name = hashlib.blake2b(f"{lat}|{long}".encode(), digest_size=16).hexdigest()
+    path = f"{settings.GEOCODE_CACHE_DIRECTORY}{name}.txt"
+    address = _read_cached_address(path)
+    if address is None:
+        l_info = _rate_limited_reverse(geolocator, f"{lat}, {long}")
+        address_details = l_info.raw.get("address", {})
+        city = address_details.get("city") or ""
+        country = address_details.get("country") or ""
+        postcode = address_details.get("postcode") or ""
+        address = f"Country: {country} | City: {city} | Postcode: {postcode}"
+        try:
+            write_file(path, address.encode("utf-8"))
+        except OSError as e:
+            logger.info(f"Address could not be cached on disk. {e}")
+
+    with _geocode_lock:
+        _geocode_cache[key] = address
+    return address
+
+
+def _reverse_geocode_parcels(
+    geolocator: Nominatim, parcels: Iterable[dict | None]
+) -> dict[tuple, str | Exception]:
+    """
+    Addresses of the locations of fetched parcels, once per location.
+    Errors are returned in place of the address, to be raised when the parcel is built.
+
+    :return: Address or error per (lat, long) of the location
+    """
+    addresses = {}
+    for parcel in parcels:
+        location = (parcel or {}).get("location")
+        if not location:
+            continue
+        key = (location.get("lat"), location.get("long"))
+        if key in addresses:
+            continue
+        try:
+            addresses[key] = reverse_geocode(geolocator, *key)
+        except Exception as e:
+            addresses[key] = e
+    return addresses
+
+
+def _parcel_url(parcel_id: str) -> str:
+    return f'{FARMCALENDAR_URLS["parcel"]}{parcel_id}/'
+
+
+def _farm_url(farm_id: str) -> str:
+    return f'{FARMCALENDAR_URLS["farm"]}{farm_id}/'
+
+
+def _get_farm_id(farm_parcel_info: dict) -> str | None:
+    # Parcels without a farm have no "farm" entry, or a null one
+    farm_urn = (farm_parcel_info.get("farm") or {}).get("@id")
+    if not farm_urn:
+        return None
+    return farm_urn.rpartition(":")[2] or None
+
+
+def _empty_parcel_info() -> tuple[ParcelInfo, FarmInfo, str]:
     farm = FarmInfo(
         description="",
         administrator="",
@@ -102,38 +473,27 @@ def get_parcel_info(
         municipality="",
         contactPerson="",
     )
-    parcel_info = ParcelInfo(address="", area=0.0, lat=0.0, long=0.0)
-    identifier = ""
-    if not settings.REPORTING_USING_GATEKEEPER:
-        if identifier_flag:
-            return parcel_info, farm, identifier
-        else:
-            return parcel_info, farm
-    farm_parcel_info = make_get_request(
-        url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["parcel"]}{parcel_id}/',
-        token=token,
-        params={"format": "json"},
-    )
+    return ParcelInfo(address="", area=0.0, lat=0.0, long=0.0), farm, ""
 
-    if not farm_parcel_info:
-        if identifier_flag:
-            return parcel_info, farm, identifier
-        else:
-            return parcel_info, farm
+
+def _build_parcel_info(
+    farm_parcel_info: dict,
+    farm_info: dict | None,
+    geolocator: Nominatim,
+    addresses: Mapping[tuple, str | Exception] | None = None,
+) -> tuple[tuple[ParcelInfo, FarmInfo, str], bool]:
+    """
+    Build parcel, farm and address information from fetched parcel and farm.
+    The address is taken from addresses (see _reverse_geocode_parcels) if it is there.
+
+    :return: ((parcel_info, farm, identifier), complete), complete is False if any lookup failed
+    """
+    parcel_info, farm, identifier = _empty_parcel_info()
 
     location = farm_parcel_info.get("location")
     parcel_info.area = farm_parcel_info.get("area", 0.0)
-    farm_id = farm_parcel_info.get("farm").get("@id", None)
-
-    if farm_id:
-        farm_id = farm_id.split(":")[-1]
-    if farm_id:
-        farm_info = make_get_request(
-            url=f'{settings.REPORTING_FARMCALENDAR_BASE_URL}{settings.REPORTING_FARMCALENDAR_URLS["farm"]}{farm_id}/',
-            token=token,
-            params={"format": "json"},
-        )
 
+    if _get_farm_id(farm_parcel_info):
         contact = farm_info.get("contactPerson") or {}
         farm = FarmInfo(
             description=farm_info.get("description") or "",
@@ -149,60 +509,223 @@ def get_parcel_info(
         if location:
             lat = location.get('lat')
             long = location.get('long')
-            coordinates = f"{lat}, {long}"
             parcel_info.lat = lat
             parcel_info.long = long
-            l_info = geolocator.reverse(coordinates)
-            address_details = l_info.raw.get("address", {})
-            city = address_details.get("city") or ""
-            country = address_details.get("country") or ""
-            postcode = address_details.get("postcode") or ""
-            address = f"Country: {country} | City: {city} | Postcode: {postcode}"
+            address = (addresses or {}).get((lat, long))
+            if address is None:
+                address = reverse_geocode(geolocator, lat, long)
+            elif isinstance(address, Exception):
+                raise address
             parcel_info.address = address
     except Exception as e:
-        logger.error("Error with geolocator", e)
-        if identifier_flag:
-            return parcel_info, farm, identifier
-        return parcel_info, farm
+        logger.warning(f"Error with geolocator for location {location}. {e}")
+        return (parcel_info, farm, identifier), False
 
-    if identifier_flag:
-        return parcel_info, farm, identifier
-    return parcel_info, farm
+    return (parcel_info, farm, identifier), True
 
 
-def get_farm_operation_data(
-    id: str, token: dict[str, str], params: dict, observations: list, materials: list
+def _fetch_parcel_info(
+    parcel_id: str, token: str, geolocator: Nominatim
+) -> tuple[tuple[ParcelInfo, FarmInfo, str], bool]:
+    """
+    Fetch parcel, farm and address information
+
+    :return: ((parcel_info, farm, identifier), complete), complete is False if any lookup failed
+    """
+    farm_parcel_info = make_get_request(
+        url=_parcel_url(parcel_id),
+        token=token,
+        params={"format": "json"},
+    )
+
+    if not farm_parcel_info:
+        return _empty_parcel_info(), False
+
+    farm_id = _get_farm_id(farm_parcel_info)
+    farm_info = None
+    if farm_id:
+        farm_info = _get_farms([farm_id], token)[farm_id]
+
+    return _build_parcel_info(farm_parcel_info, farm_info, geolocator)
+
+
+def _get_farms(farm_ids: list[str], token: str) -> dict[str, dict | None]:
+    """
+    Farm calendar entries of farms, cached per (farm_id, token) for PARCEL_INFO_CACHE_TTL seconds.
+    Farms missing from the cache are fetched concurrently.
+
+    :return: Farm per ID, None if it could not be fetched
+    """
+    token_key = token_cache_key(str(token))
+    farms = {}
+    with _parcel_info_lock:
+        for farm_id in farm_ids:
+            farm = _farm_cache.get((farm_id, token_key))
+            if farm is not None:
+                farms[farm_id] = farm
+
+    missing = [farm_id for farm_id in farm_ids if farm_id not in farms]
+    if len(missing) == 1:
+        fetched = [
+            make_get_request(
+                url=_farm_url(missing[0]), token=token, params={"format": "json"}
+            )
+        ]
+    elif missing:
+        fetched = make_get_requests(
+            [_farm_url(farm_id) for farm_id in missing],
+            token=token,
+            params={"format": "json"},
+        )
+    else:
+        fetched = []
+    for farm_id, farm in zip(missing, fetched):
+        farms[farm_id] = farm
+        if farm:
+            with _parcel_info_lock:
+                _farm_cache[(farm_id, token_key)] = farm
+    return farms
+
+
+def get_parcel_info(
+    parcel_id: str, token: dict, geolocator: Nominatim, identifier_flag: bool = False
 ):
     """
-    Fetches observations and material-related data for a farm operation.
+    Get parcel and farm information, cached per (parcel_id, token) for PARCEL_INFO_CACHE_TTL seconds.
+    Returned models are shared between callers and must not be modified.
+    """
+    if not settings.REPORTING_USING_GATEKEEPER:
+        info = _empty_parcel_info()
+    else:
+        key = (parcel_id, token_cache_key(str(token)))
+        with _parcel_info_lock:
+            info = _parcel_info_cache.get(key)
+        if info is None:
+            info, complete = _fetch_parcel_info(parcel_id, token, geolocator)
+            # Failed lookups are retried on the next report
+            if complete:
+                with _parcel_info_lock:
+                    _parcel_info_cache[key] = info
+
+    if identifier_flag:
+        return info
+    return info[0], info[1]
+
+
+def get_parcels_info(
+    parcel_ids: Iterable[str],
+    token: dict,
+    geolocator: Nominatim,
+    identifier_flag: bool = False,
+) -> dict:
+    """
+    Get parcel and farm information (see get_parcel_info) of several parcels, once per ID.
+    Parcels missing from the cache are fetched concurrently, then their farms (see _get_farms)
+    while their locations are reverse geocoded.
 
+    :return: get_parcel_info result per parcel ID
     """
-    base_url = settings.REPORTING_FARMCALENDAR_BASE_URL
-    urls = settings.REPORTING_FARMCALENDAR_URLS
+    parcel_ids = set(parcel_ids)
+    if not settings.REPORTING_USING_GATEKEEPER:
+        return {
+            parcel_id: get_parcel_info(parcel_id, token, geolocator, identifier_flag)
+            for parcel_id in parcel_ids
+        }
+
+    token_key = token_cache_key(str(token))
+    infos = {}
+    with _parcel_info_lock:
+        for parcel_id in parcel_ids:
+            info = _parcel_info_cache.get((parcel_id, token_key))
+            if info is not None:
+                infos[parcel_id] = info
+
+    missing = [parcel_id for parcel_id in parcel_ids if parcel_id not in infos]
+    if missing:
+        parcels = make_get_requests(
+            [_parcel_url(parcel_id) for parcel_id in missing],
+            token=token,
+            params={"format": "json"},
+        )
+        # Geocoding waits for the Nominatim rate limit, the farm requests go out meanwhile
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            geocoded = executor.submit(_reverse_geocode_parcels, geolocator, parcels)
+            farms = _get_farms(
+                list({_get_farm_id(parcel) for parcel in parcels if parcel} - {None}),
+                token,
+            )
+            addresses = geocoded.result()
+        for parcel_id, parcel in zip(missing, parcels):
+            if not parcel:
+                info, complete = _empty_parcel_info(), False
+            else:
+                info, complete = _build_parcel_info(
+                    parcel, farms.get(_get_farm_id(parcel)), geolocator, addresses
+                )
+            # Failed lookups are retried on the next report
+            if complete:
+                with _parcel_info_lock:
+                    _parcel_info_cache[(parcel_id, token_key)] = info
+            infos[parcel_id] = info
 
-    # Fetch and append observations
-    obs_url = f'{base_url}{urls["operations"]}{id}{urls["observations"]}'
-    observations_local = make_get_request(url=obs_url, token=token, params=params)
+    if identifier_flag:
+        return infos
+    return {parcel_id: info[:2] for parcel_id, info in infos.items()}
+
+
+def _farm_operation_data_urls(id: str) -> list[str]:
+    urls = settings.REPORTING_FARMCALENDAR_URLS
+    operation_url = f'{FARMCALENDAR_URLS["operations"]}{id}'
+    return [
+        # Observations
+        f'{operation_url}{urls["observations"]}',
+        # Materials, irrigation operations and compost turning operations
+        f'{operation_url}{urls["materials"]}',
+        f'{operation_url}{urls["irrigations"]}',
+        f'{operation_url}{urls["turning_operations"]}',
+    ]
+
+
+def _extend_farm_operation_data(
+    responses: list, observations: list, materials: list
+) -> None:
+    observations_local, *materials_partials = responses
     if observations_local:
         observations.extend(observations_local)
+    for materials_partial in materials_partials:
+        if materials_partial:
+            materials.extend(materials_partial)
+
+
+def get_farm_operation_data(
+    id: str, token: dict[str, str], params: dict, observations: list, materials: list
+):
+    """
+    Fetches observations and material-related data for a farm operation concurrently.
+
+    """
+    get_farm_operations_data([id], token, params, observations, materials)
 
-    # Fetch and append materials
-    material_url = f'{base_url}{urls["operations"]}{id}{urls["materials"]}'
-    materials_partials = make_get_request(url=material_url, token=token, params=params)
-    if materials_partials:
-        materials.extend(materials_partials)
 
-    # Fetch and append irrigation operations
-    irrigation_url = f'{base_url}{urls["operations"]}{id}{urls["irrigations"]}'
-    irrigation_ops = make_get_request(url=irrigation_url, token=token, params=params)
-    if irrigation_ops:
-        materials.extend(irrigation_ops)
+def get_farm_operations_data(
+    ids: list[str], token: dict[str, str], params: dict, observations: list, materials: list
+):
+    """
+    Fetches observations and material-related data for farm operations concurrently.
+    Data is appended in the same order as calling get_farm_operation_data per operation.
 
-    # Fetch and append compost turning operations
-    turn_url = f'{base_url}{urls["operations"]}{id}{urls["turning_operations"]}'
-    compost_turning_ops = make_get_request(url=turn_url, token=token, params=params)
-    if compost_turning_ops:
-        materials.extend(compost_turning_ops)
+    """
+    urls_per_operation = [_farm_operation_data_urls(id) for id in ids]
+    responses = make_get_requests(
+        [url for urls in urls_per_operation for url in urls],
+        token=token,
+        params=params,
+    )
+    for i, urls in enumerate(urls_per_operation):
+        start = i * len(urls)
+        _extend_farm_operation_data(
+            responses[start:start + len(urls)], observations, materials
+        )
 
 
 def get_pesticide(id: str, token: dict[str, str]):
@@ -210,74 +733,77 @@ def get_pesticide(id: str, token: dict[str, str]):
     Fetches pesticide for Crop Operation
 
     """
-    base_url = settings.REPORTING_FARMCALENDAR_BASE_URL
-    urls = settings.REPORTING_FARMCALENDAR_URLS
-
-    pest_url = f'{base_url}{urls["pest"]}{id}/'
+    pest_url = f'{FARMCALENDAR_URLS["pest"]}{id}/'
     pest = make_get_request(url=pest_url, token=token, params={"format": "json"})
     return pest
 
 
+def get_pesticides(ids: Iterable[str], token: dict[str, str]) -> dict[str, dict | None]:
+    """
+    Fetches pesticides concurrently, once per ID
+
+    :return: Pesticide per ID, None if it could not be fetched
+    """
+    ids = list(set(ids))
+    if len(ids) == 1:
+        return {ids[0]: get_pesticide(ids[0], token)}
+    return dict(
+        zip(
+            ids,
+            make_get_requests(
+                [f'{FARMCALENDAR_URLS["pest"]}{id}/' for id in ids],
+                token=token,
+                params={"format": "json"},
+            ),
+        )
+    )
+
+
+# (family, style, size) of label and value cells of key/value rows
+LABEL_FONT = ("FreeSerif", "B", 10)
+VALUE_FONT = ("FreeSerif", "", 10)
+
+
+def display_pdf_key_values(pdf: FPDF, rows: Iterable[tuple[str, str]]) -> None:
+    """
+    Display rows of bold label cell followed by a filled value cell.
+    fpdf2 skips set_font if the font is already selected, so only the
+    label/value switch itself is written to the page.
+
+    :param pdf: PDF to write to
+    :param rows: Pairs of (label, value)
+    """
+    for label, value in rows:
+        pdf.set_font(*LABEL_FONT)
+        pdf.cell(40, 8, label)
+        pdf.set_font(*VALUE_FONT)
+        pdf.multi_cell(0, 8, value, ln=True, fill=True)
+
+
 def display_pdf_parcel_details(pdf: FPDF, parcel_id: str, geolocator: Nominatim, token: str | dict) -> ParcelInfo:
     parcel_data, farm, identifier = get_parcel_info(
         parcel_id, token, geolocator, identifier_flag=True
     )
-    address = parcel_data.address
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(40, 8, "Parcel Location:")
-    pdf.set_font("FreeSerif", "", 10)
-    pdf.multi_cell(0, 8, address, ln=True, fill=True)
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(40, 8, "Parcel Identifier:")
-    pdf.set_font("FreeSerif", "", 10)
-    pdf.multi_cell(0, 8, identifier, ln=True, fill=True)
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(
-        40,
-        8,
-        "Farm Location:",
-    )
-    pdf.set_font("FreeSerif", "", 10)
-    farm_local = f"Name: {farm.name} | Municipality: {farm.municipality}"
-    pdf.multi_cell(0, 8, farm_local, ln=True, fill=True)
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(
-        40,
-        8,
-        "Administrator:",
-    )
-    pdf.set_font("FreeSerif", "", 10)
-    pdf.multi_cell(0, 8, farm.administrator, ln=True, fill=True)
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(
-        40,
-        8,
-        "Contact Person:",
-    )
-    pdf.set_font("FreeSerif", "", 10)
-    pdf.multi_cell(0, 8, farm.contactPerson, ln=True, fill=True)
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(
-        40,
-        8,
-        "Farm vat:",
-    )
-    pdf.set_font("FreeSerif", "", 10)
-    pdf.multi_cell(0, 8, farm.vatID, ln=True, fill=True)
-
-    pdf.set_font("FreeSerif", "B", 10)
-    pdf.cell(
-        40,
-        8,
-        "Farm Description:",
+
+    display_pdf_key_values(
+        pdf,
+        [
+            ("Parcel Location:", parcel_data.address),
+            ("Parcel Identifier:", identifier),
+            (
+                "Farm Location:",
+                f"Name: {farm.name} | Municipality: {farm.municipality}",
+            ),
+            ("Administrator:", farm.administrator),
+            ("Contact Person:", farm.contactPerson),
+            ("Farm vat:", farm.vatID),
+        ],
     )
-    pdf.set_font("FreeSerif", "", 10)
+
+    # Last row is not followed by a line break (multi_cell without ln)
+    pdf.set_font(*LABEL_FONT)
+    pdf.cell(40, 8, "Farm Description:")
+    pdf.set_font(*VALUE_FONT)
     pdf.multi_cell(0, 8, farm.description, fill=True)
     return parcel_data
 
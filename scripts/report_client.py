@@ -7,8 +7,15 @@ import argparse
 # --- Configuration ---
 # Maximum number of times to check for the PDF before giving up
 MAX_RETRIES = 10
-# Seconds to wait between check attempts
-RETRY_DELAY_SECONDS = 3
+# Seconds to wait before the second check attempt. The wait grows by RETRY_BACKOFF_FACTOR
+# after every attempt, up to RETRY_MAX_DELAY_SECONDS (about 43s over all attempts)
+RETRY_INITIAL_DELAY_SECONDS = 0.5
+RETRY_BACKOFF_FACTOR = 1.8
+RETRY_MAX_DELAY_SECONDS = 8
+# (connect, read) timeout of a single request in seconds
+REQUEST_TIMEOUT = (5, 60)
+# Size of the chunks the PDF is written to disk in, while it is downloaded
+DOWNLOAD_CHUNK_SIZE = 1 << 16
 
 # USAGE EXAMPLES:
 
@@ -21,11 +28,14 @@ RETRY_DELAY_SECONDS = 3
 
 # --- End Configuration ---
 
-def generate_report(report_type: str, base_url: str, token: str, json_file: str) -> str | None:
+def generate_report(
+    session: requests.Session, report_type: str, base_url: str, token: str, json_file: str
+) -> str | None:
     """
     Calls the appropriate report endpoint and returns the report UUID.
 
     Args:
+        session: The session used for all requests to the reporting service.
         report_type: The type of report ('animal', 'irrigation', 'pesticides', 'fertilization', 'compost').
         base_url: The base URL of the reporting service.
         token: The authentication bearer token.
@@ -48,7 +58,9 @@ def generate_report(report_type: str, base_url: str, token: str, json_file: str)
             files = {
                 "data": (os.path.basename(json_file), f, "application/json")
             }
-            response = requests.post(report_url, headers=headers, files=files)
+            response = session.post(
+                report_url, headers=headers, files=files, timeout=REQUEST_TIMEOUT
+            )
             response.raise_for_status()  # Raises an exception for 4XX/5XX errors
 
         response_data = response.json()
@@ -71,9 +83,10 @@ def generate_report(report_type: str, base_url: str, token: str, json_file: str)
         return None
 
 
-def download_pdf(report_uuid: str, base_url: str, token: str):
+def download_pdf(session: requests.Session, report_uuid: str, base_url: str, token: str):
     """
     Polls the retrieval endpoint and downloads the generated PDF.
+    The PDF is written to disk while it is received, it is never held in memory as a whole.
     """
     print(f"⏳ Attempting to download PDF for report ID: {report_uuid}...")
     pdf_url = f"{base_url}/api/v1/openagri-report/{report_uuid}/"
@@ -82,23 +95,30 @@ def download_pdf(report_uuid: str, base_url: str, token: str):
         "Authorization": f"Bearer {token}"
     }
 
+    # Small reports are usually ready right away, so the first checks come quickly
+    delay = RETRY_INITIAL_DELAY_SECONDS
     for attempt in range(MAX_RETRIES):
         try:
             print(f"   Attempt {attempt + 1}/{MAX_RETRIES}... ", end="", flush=True)
-            response = requests.get(pdf_url, headers=headers)
-
-            if response.status_code == 202:
-                print(f"PDF is still being generated. Retrying in {RETRY_DELAY_SECONDS}s...")
-                time.sleep(RETRY_DELAY_SECONDS)
-                continue
-
-            response.raise_for_status()
-
-            output_filename = f"{report_uuid}.pdf"
-            with open(output_filename, 'wb') as f:
-                f.write(response.content)
-                f.flush()
-                os.fsync(f.fileno())
+            with session.get(
+                pdf_url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT
+            ) as response:
+                if response.status_code == 202:
+                    # Reading the short body returns the connection to the session pool,
+                    # closing it unread would drop the connection instead
+                    for _ in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        pass
+                    print(f"PDF is still being generated. Retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    delay = min(delay * RETRY_BACKOFF_FACTOR, RETRY_MAX_DELAY_SECONDS)
+                    continue
+
+                response.raise_for_status()
+
+                output_filename = f"{report_uuid}.pdf"
+                with open(output_filename, 'wb') as f:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
 
             print(f"\n🎉 PDF downloaded successfully! Saved as '{output_filename}'")
             return
@@ -145,9 +165,11 @@ def main():
 
     args = parser.parse_args()
 
-    report_id = generate_report(args.type, args.url, args.token, args.file)
-    if report_id:
-        download_pdf(report_id, args.url, args.token)
+    # One session, so polling reuses the connection opened by the upload
+    with requests.Session() as session:
+        report_id = generate_report(session, args.type, args.url, args.token, args.file)
+        if report_id:
+            download_pdf(session, report_id, args.url, args.token)
 
 
 if __name__ == "__main__":